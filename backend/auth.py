@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Request, HTTPException, Header
+from fastapi import APIRouter, Depends, File, Query, Request, HTTPException, Header, UploadFile
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import hashlib
 import os
-import asyncio
+import time
+import uuid
+
+from bulk_io import detect_format, iter_records
+from cache import TTLCache
+from executor import run_blocking
+from profile_cache import set_profile_fields
+from sessions import session_store
+from token_cache import verify_id_token_async
+from write_behind import WriteBehindQueue, fingerprint
 
 # Initialize Firebase Admin SDK once
 if not firebase_admin._apps:
@@ -18,12 +28,65 @@ if not firebase_admin._apps:
 router = APIRouter()
 db = firestore.client()
 
-# Stub async function to save user data to DB (replace with real DB logic)
+# Fingerprint of the last users/{uid} record written (or queued) per uid
+USER_FINGERPRINT_CACHE_SIZE = int(os.getenv("USER_FINGERPRINT_CACHE_SIZE", "50000"))
+_persisted_users = TTLCache(maxsize=USER_FINGERPRINT_CACHE_SIZE)
+
+def _write_user_batch(users: List[dict]):
+    # Several logins for one uid can land in a batch; the latest wins
+    latest = {user_data["uid"]: user_data for user_data in users}
+    batch = db.batch()
+    for uid, user_data in latest.items():
+        batch.set(db.collection("users").document(uid), user_data, merge=True)
+    batch.commit()
+
+def _forget_failed_users(users: List[dict], exc: Exception):
+    # Let the next login retry the write
+    for user_data in users:
+        _persisted_users.pop(user_data["uid"])
+
+user_writer = WriteBehindQueue(
+    "users", _write_user_batch, max_batch=500, flush_interval=1.0, on_failure=_forget_failed_users
+)
+
+# Save user data to the Firestore users collection, skipping unchanged records.
+# Changed records are written in batches by the background flusher.
 async def save_user_to_db(user_data: dict):
-    # Example: Save user_data in Firestore users collection
-    user_ref = db.collection("users").document(user_data["uid"])
-    user_ref.set(user_data, merge=True)
-    await asyncio.sleep(0)  # simulate async operation
+    digest = fingerprint(user_data)
+    if _persisted_users.get(user_data["uid"]) == digest:
+        return
+    _persisted_users.set(user_data["uid"], digest)
+    user_writer.put(user_data)
+
+# Identity dependency shared by all routers. The bearer token is verified at
+# most once per request; the claims are memoized on request.state.
+async def get_identity(request: Request, authorization: Optional[str] = Header(None)) -> dict:
+    identity = getattr(request.state, "identity", None)
+    if identity is not None:
+        return identity
+
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid or missing authorization token")
+    id_token = authorization.split("Bearer ")[1]
+    try:
+        identity = await verify_id_token_async(id_token)
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Token verification failed: {str(e)}")
+
+    request.state.identity = identity
+    return identity
+
+async def get_current_user_id(identity: dict = Depends(get_identity)) -> str:
+    return identity["uid"]
+
+# Alias kept for routers that expect the uid under this name
+get_current_user = get_current_user_id
+
+# Admin-only routes require the `admin: true` custom claim
+async def require_admin(identity: dict = Depends(get_identity)) -> dict:
+    if not identity.get("admin"):
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return identity
 
 class Preferences(BaseModel):
     uid: str
@@ -34,12 +97,11 @@ class Preferences(BaseModel):
 @router.post("/update-preferences")
 async def update_preferences(data: Preferences):
     try:
-        user_ref = db.collection("user_profiles").document(data.uid)
-        user_ref.set({
+        await set_profile_fields(data.uid, {
             "diet": data.diet,
             "allergies": data.allergies,
             "cuisines": data.cuisines
-        }, merge=True)
+        })
         return {"message": "Preferences updated successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -54,12 +116,160 @@ async def signup(request: Request):
         raise HTTPException(status_code=400, detail="Email and password required")
 
     try:
-        user = auth.create_user(email=email, password=password)
+        user = await run_blocking(auth.create_user, email=email, password=password)
         await save_user_to_db({"uid": user.uid, "email": email})
         return {"message": "User created successfully", "uid": user.uid}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating user: {str(e)}")
 
+# ---------- Bulk signup (admin) ----------
+
+IMPORT_BATCH_SIZE = 1000       # Firebase import_users limit per call
+FIRESTORE_BATCH_SIZE = 500     # Firestore WriteBatch limit
+IMPORT_HASH_ROUNDS = int(os.getenv("USER_IMPORT_HASH_ROUNDS", "10000"))
+LOOKUP_BATCH_SIZE = 100        # Firebase get_users limit per call
+
+def _existing_accounts(rows: List[tuple]):
+    """
+    Return the uids and (lowercased) emails among `rows` that already belong
+    to Firebase accounts. import_users would overwrite a matching uid and
+    does not enforce unique emails, so these rows must not be imported.
+    """
+    identifiers = []
+    for _, row in rows:
+        identifiers.append(auth.UidIdentifier(row["uid"]))
+        identifiers.append(auth.EmailIdentifier(row["email"]))
+    uids, emails = set(), set()
+    for start in range(0, len(identifiers), LOOKUP_BATCH_SIZE):
+        result = auth.get_users(identifiers[start:start + LOOKUP_BATCH_SIZE])
+        for user in result.users:
+            uids.add(user.uid)
+            if user.email:
+                emails.add(user.email.lower())
+    return uids, emails
+
+def _import_user_chunk(rows: List[tuple]) -> List[dict]:
+    """
+    Import up to IMPORT_BATCH_SIZE validated (row_number, record) pairs with one
+    import_users call and write their users/{uid} documents in batches.
+    Rows matching an existing account are skipped. Returns per-row errors.
+    """
+    errors = []
+    existing_uids, existing_emails = _existing_accounts(rows)
+    fresh = []
+    for row_number, row in rows:
+        if row["uid"] in existing_uids:
+            errors.append({"row": row_number, "error": "uid already exists"})
+        elif row["email"].lower() in existing_emails:
+            errors.append({"row": row_number, "error": "email already registered"})
+        else:
+            fresh.append((row_number, row))
+    rows = fresh
+    if not rows:
+        return errors
+
+    records = []
+    for _, row in rows:
+        password = row.get("password")
+        salt = os.urandom(16) if password else None
+        records.append(auth.ImportUserRecord(
+            uid=row["uid"],
+            email=row["email"],
+            display_name=row.get("name") or None,
+            password_hash=hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, IMPORT_HASH_ROUNDS) if password else None,
+            password_salt=salt,
+        ))
+
+    result = auth.import_users(records, hash_alg=auth.UserImportHash.pbkdf2_sha256(rounds=IMPORT_HASH_ROUNDS))
+    errors += [{"row": rows[err.index][0], "error": err.reason} for err in result.errors]
+    failed = {err.index for err in result.errors}
+
+    imported = [row for i, (_, row) in enumerate(rows) if i not in failed]
+    for start in range(0, len(imported), FIRESTORE_BATCH_SIZE):
+        batch = db.batch()
+        for row in imported[start:start + FIRESTORE_BATCH_SIZE]:
+            user_data = {"uid": row["uid"], "email": row["email"]}
+            if row.get("name"):
+                user_data["name"] = row["name"]
+            batch.set(db.collection("users").document(row["uid"]), user_data, merge=True)
+            _persisted_users.set(row["uid"], fingerprint(user_data))
+        batch.commit()
+    return errors
+
+def _validate_import_row(row: dict) -> dict:
+    email = (row.get("email") or "").strip()
+    if not email or "@" not in email:
+        raise ValueError("valid email required")
+    password = row.get("password") or None
+    if password is not None and len(password) < 6:
+        raise ValueError("password must be at least 6 characters")
+    record = {
+        "uid": (row.get("uid") or "").strip() or uuid.uuid4().hex,
+        "email": email,
+        "name": (row.get("name") or "").strip(),
+        "password": password,
+    }
+    # Let the SDK reject a malformed uid, email or name here, where it fails
+    # only this row; inside the chunk it would fail all of import_users
+    auth.UidIdentifier(record["uid"])
+    auth.EmailIdentifier(record["email"])
+    auth.ImportUserRecord(uid=record["uid"], email=record["email"], display_name=record["name"] or None)
+    return record
+
+@router.post("/admin/bulk-signup")
+async def bulk_signup(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or jsonl; defaults to the file extension"),
+    admin: dict = Depends(require_admin)
+):
+    fmt = detect_format(file, format)
+    started = time.perf_counter()
+    total = imported = 0
+    errors = []
+    chunk = []
+    seen_uids, seen_emails = set(), set()
+
+    async def flush():
+        nonlocal imported
+        try:
+            chunk_errors = await run_blocking(_import_user_chunk, chunk)
+        except Exception as e:
+            chunk_errors = [{"row": row_number, "error": str(e)} for row_number, _ in chunk]
+        errors.extend(chunk_errors)
+        imported += len(chunk) - len(chunk_errors)
+        chunk.clear()
+
+    async for row_number, row in iter_records(file, fmt):
+        total += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            record = _validate_import_row(row)
+            if record["uid"] in seen_uids:
+                raise ValueError("duplicate uid in upload")
+            if record["email"].lower() in seen_emails:
+                raise ValueError("duplicate email in upload")
+            seen_uids.add(record["uid"])
+            seen_emails.add(record["email"].lower())
+            chunk.append((row_number, record))
+        except ValueError as e:
+            errors.append({"row": row_number, "error": str(e)})
+            continue
+        if len(chunk) >= IMPORT_BATCH_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "total_rows": total,
+        "imported": imported,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed else None,
+    }
+
 @router.post("/login")
 async def login(request: Request):
     body = await request.json()
@@ -68,7 +278,7 @@ async def login(request: Request):
         raise HTTPException(status_code=400, detail="Missing ID token")
 
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = await verify_id_token_async(id_token)
         uid = decoded_token.get("uid")
         email = decoded_token.get("email", "")
         name = decoded_token.get("name", "")
@@ -99,3 +309,12 @@ async def logout(request: Request):
     if hasattr(request, "session") and request.session is not None:
         request.session.clear()
     return {"message": "Logged out"}
+
+@router.post("/logout-all")
+async def logout_all(request: Request):
+    uid = request.session.get("uid") if (hasattr(request, "session") and request.session is not None) else None
+    if not uid:
+        raise HTTPException(status_code=401, detail="Not logged in")
+    revoked = await session_store.revoke_user(uid)
+    request.session.clear()
+    return {"message": "Logged out everywhere", "sessions_revoked": revoked}
@@ -0,0 +1,146 @@
+import codecs
+import csv
+import json
+import zipfile
+
+from fastapi import HTTPException, UploadFile
+
+from executor import run_blocking
+
+READ_CHUNK_SIZE = 64 * 1024
+
+FORMATS_BY_SUFFIX = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+}
+
+
+def detect_format(upload: UploadFile, fmt: str = None) -> str:
+    """
+    Resolve the upload format from an explicit value or the file extension.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        fmt = "jsonl" if fmt == "ndjson" else fmt
+    else:
+        name = (upload.filename or "").lower()
+        fmt = next((f for suffix, f in FORMATS_BY_SUFFIX.items() if name.endswith(suffix)), None)
+    if fmt not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Upload must be CSV or JSONL/NDJSON")
+    return fmt
+
+
+async def iter_lines(upload: UploadFile):
+    """
+    Yield decoded lines from an upload without reading it fully into memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        chunk = await upload.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_records(upload: UploadFile, fmt: str):
+    """
+    Stream (row_number, record_or_error) pairs from a CSV or JSONL upload.
+    Row numbers are 1-based data rows; blank lines are skipped. A row that
+    cannot be parsed yields a ValueError instead of stopping the stream.
+
+    CSV rows are parsed line by line, so quoted fields may not span lines.
+    """
+    header = None
+    row_number = 0
+    async for line in iter_lines(upload):
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+
+        row_number += 1
+        try:
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                if len(values) > len(header):
+                    raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+                # Like csv.DictReader, missing trailing columns read as None
+                record = dict(zip(header, values + [None] * (len(header) - len(values))))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("each line must be a JSON object")
+        except (ValueError, csv.Error) as e:
+            yield row_number, ValueError(str(e))
+            continue
+        yield row_number, record
+
+
+ZIP_MANIFEST_SUFFIXES = (".ndjson", ".jsonl")
+ZIP_READ_ROWS = 1000  # manifest lines read per trip to the I/O pool
+
+
+def open_zip_upload(upload: UploadFile) -> zipfile.ZipFile:
+    """
+    Open an uploaded zip (blocking: reads the central directory). The
+    upload is spooled to disk by Starlette, so members are read lazily.
+    """
+    try:
+        return zipfile.ZipFile(upload.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Upload is not a valid zip file")
+
+
+def zip_manifest_name(archive: zipfile.ZipFile) -> str:
+    for name in sorted(archive.namelist()):
+        if name.lower().endswith(ZIP_MANIFEST_SUFFIXES) and not name.startswith("__MACOSX/"):
+            return name
+    raise HTTPException(status_code=400, detail="Zip must contain an .ndjson or .jsonl manifest")
+
+
+def _read_lines(stream, count):
+    lines = []
+    for raw in stream:
+        lines.append(raw.decode("utf-8-sig").rstrip("\r\n"))
+        if len(lines) >= count:
+            break
+    return lines
+
+
+async def iter_zip_records(archive: zipfile.ZipFile):
+    """
+    Stream (row_number, record_or_error) pairs from the NDJSON manifest in a
+    zip, reading it in chunks on the I/O pool.
+    """
+    stream = archive.open(zip_manifest_name(archive))
+    row_number = 0
+    try:
+        while True:
+            lines = await run_blocking(_read_lines, stream, ZIP_READ_ROWS)
+            if not lines:
+                break
+            for line in lines:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("each line must be a JSON object")
+                except ValueError as e:
+                    yield row_number, ValueError(str(e))
+                    continue
+                yield row_number, record
+    finally:
+        stream.close()
@@ -1,22 +1,43 @@
 # contact.py
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+import os
+
+from fastapi import APIRouter
 from pydantic import BaseModel
 from firebase_admin import firestore
 
+from write_behind import WriteBehindQueue
+
 router = APIRouter()
 
 db = firestore.client()
 
+# Submissions are acknowledged once validated and written behind in
+# WriteBatches; a failed flush is spilled to disk and retried once writes
+# succeed again (or on restart).
+CONTACT_FLUSH_INTERVAL = float(os.getenv("CONTACT_FLUSH_INTERVAL", "2.0"))
+CONTACT_SPILL_DIR = os.getenv("CONTACT_SPILL_DIR", "contact_spill")
+
 class ContactMessage(BaseModel):
     name: str
     email: str
     message: str
 
+def _write_contact_batch(messages):
+    batch = db.batch()
+    collection = db.collection("contact_messages")
+    for message in messages:
+        batch.set(collection.document(), message)
+    batch.commit()
+
+contact_writer = WriteBehindQueue(
+    "contact_messages",
+    _write_contact_batch,
+    max_batch=500,  # Firestore WriteBatch limit
+    flush_interval=CONTACT_FLUSH_INTERVAL,
+    spill_dir=CONTACT_SPILL_DIR,
+)
+
 @router.post("/contact")
 async def submit_contact_form(data: ContactMessage):
-    try:
-        db.collection("contact_messages").add(data.dict())
-        return {"status": "success", "message": "Message submitted successfully"}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+    contact_writer.put(data.dict())
+    return {"status": "success", "message": "Message submitted successfully"}
@@ -1,34 +1,167 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from dotenv import load_dotenv
 import os
+import threading
+
+import metrics
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Connect to MongoDB
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
-db = client["swaadsathi"]
+# MongoDB settings. MONGODB_URI is accepted as well, since the recipes
+# router historically read that name.
+MONGO_URI = os.getenv("MONGO_URI") or os.getenv("MONGODB_URI") or "mongodb://localhost:27017/"
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "swaadsathi")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+# zlib ships with Python; snappy/zstd need python-snappy/zstandard installed
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+
+# Checkout wait buckets, in milliseconds
+_WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+class PoolCheckoutMonitor(monitoring.ConnectionPoolListener):
+    """
+    Records how long operations wait to check a connection out of the pool,
+    so worker counts can be sized against Mongo capacity.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failures = 0
+        self.in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.buckets = [0] * (len(_WAIT_BUCKETS_MS) + 1)
+
+    def _record_wait(self, duration):
+        if duration is None:
+            return
+        self.total_wait += duration
+        self.max_wait = max(self.max_wait, duration)
+        wait_ms = duration * 1000
+        index = next((i for i, bound in enumerate(_WAIT_BUCKETS_MS) if wait_ms <= bound), len(_WAIT_BUCKETS_MS))
+        self.buckets[index] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self._record_wait(event.duration)
 
-# Default users collection
-users_collection = db["users"]
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures += 1
+            self._record_wait(event.duration)
 
-def save_user_to_db(user_data):
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self):
+        with self._lock:
+            waits = self.checkouts + self.failures
+            labels = [f"le_{bound}ms" for bound in _WAIT_BUCKETS_MS] + ["gt_1000ms"]
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures,
+                "avg_wait_ms": round(self.total_wait / waits * 1000, 3) if waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "wait_histogram": dict(zip(labels, self.buckets)),
+            }
+
+    # Remaining pool events are not needed for checkout timing
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+
+pool_monitor = PoolCheckoutMonitor()
+metrics.register("mongo_pool", pool_monitor.stats)
+
+# The one client per process. The FastAPI lifespan opens and closes it;
+# scripts get it lazily on first use. Async code uses the Motor client,
+# blocking code its underlying pymongo client; both share one pool.
+_client = None
+_client_lock = threading.Lock()
+
+
+def connect():
     """
-    Insert a new user or update existing user by uid.
+    Create the shared Motor client if it does not exist yet and return it.
     """
-    filter_ = {"uid": user_data["uid"]}
-    update_ = {"$set": user_data}  # Replace existing fields or add new ones
-    result = users_collection.update_one(filter_, update_, upsert=True)
-    if result.upserted_id:
-        return f"Inserted new user with id {result.upserted_id}"
-    elif result.modified_count > 0:
-        return "Updated existing user"
-    else:
-        return "No changes made"
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncIOMotorClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                compressors=MONGO_COMPRESSORS,
+                event_listeners=[pool_monitor],
+            )
+        return _client
+
+
+def close():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_client():
+    return _client or connect()
+
+
+def get_async_database():
+    return get_client()[MONGO_DB_NAME]
+
+
+def get_async_collection(name):
+    """
+    Return a Motor collection by name, for use from async handlers.
+    """
+    return get_async_database()[name]
+
+
+def get_database():
+    """
+    Return the blocking pymongo database (run its calls via executor.run_blocking).
+    """
+    return get_client().delegate[MONGO_DB_NAME]
+
+
+def get_db():
+    """
+    FastAPI dependency returning the shared AsyncIOMotorDatabase.
+    """
+    return get_async_database()
+
 
 def get_collection(name):
     """
     Return a MongoDB collection by name.
     """
-    return db[name]
+    return get_database()[name]
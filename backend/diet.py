@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from firebase_admin import auth as firebase_auth
+
+from auth import get_identity
 
 router = APIRouter(prefix="/diet", tags=["Diet"])
 
@@ -11,21 +12,8 @@ class DietRequest(BaseModel):
     height_cm: float
     activity_level: str  # "low", "moderate", "high"
 
-def verify_token(token: str):
-    try:
-        decoded_token = firebase_auth.verify_id_token(token)
-        return decoded_token
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-async def get_token_from_header(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    token = authorization.split("Bearer ")[1]
-    return verify_token(token)
-
 @router.post("/get-diet-plan")
-async def get_diet_plan(request: DietRequest, user=Depends(get_token_from_header)):
+async def get_diet_plan(request: DietRequest, user=Depends(get_identity)):
     try:
         if request.gender.lower() == "male":
             bmr = 10 * request.weight_kg + 6.25 * request.height_cm - 5 * request.age + 5
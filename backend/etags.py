@@ -0,0 +1,59 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+from db import get_async_collection
+
+# Per-collection version counters, bumped after every write to the
+# collection and shared by all workers: {_id: <collection>, version: <int>}
+VERSIONS_COLLECTION = "collection_versions"
+
+
+async def collection_version(name: str) -> int:
+    doc = await get_async_collection(VERSIONS_COLLECTION).find_one({"_id": name})
+    return doc["version"] if doc else 0
+
+
+async def bump_collection_version(*names: str):
+    for name in names:
+        await get_async_collection(VERSIONS_COLLECTION).update_one(
+            {"_id": name}, {"$inc": {"version": 1}}, upsert=True
+        )
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from the parts that determine a response, e.g. a document
+    id and version plus the query options that shape the representation.
+    """
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def list_etag(request: Request, version: int) -> str:
+    # Same collection version and same query string: same response
+    return make_etag(request.url.path, sorted(request.query_params.multi_items()), version)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    If-None-Match check; uses weak comparison as RFC 9110 requires for it.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_etag(response: Response, etag: Optional[str]):
+    # no-cache: browsers may store the body but must revalidate each use
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
@@ -0,0 +1,25 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Dedicated, bounded pool for blocking SDK calls (Firebase Admin, Firestore,
+# pymongo) so a slow round trip never stalls the event loop.
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_WORKERS,
+    thread_name_prefix="blocking-io",
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking callable on the shared I/O pool and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown(wait=True):
+    _executor.shutdown(wait=wait)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from firebase_admin import auth
+from google.auth import transport
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Google's x509 keys for Firebase ID tokens. Point FIREBASE_CERTS_URL at a
+# locally served key set to verify test tokens without network access.
+ID_TOKEN_CERT_URI = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_CERTS_URL = os.getenv("FIREBASE_CERTS_URL", ID_TOKEN_CERT_URI)
+
+CERT_FETCH_TIMEOUT = float(os.getenv("FIREBASE_CERT_FETCH_TIMEOUT", "10"))
+CERT_REFRESH_MARGIN = int(os.getenv("FIREBASE_CERT_REFRESH_MARGIN", "300"))  # refresh this long before expiry
+CERT_RETRY_INTERVAL = int(os.getenv("FIREBASE_CERT_RETRY_INTERVAL", "30"))
+DEFAULT_CERT_MAX_AGE = 3600
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class CertStore:
+    """
+    Last-known copy of the signing certificates plus their Cache-Control
+    deadline. A failed refresh keeps serving the previous key set.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.body = None
+        self.expires_at = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        try:
+            response = requests.get(self.url, timeout=CERT_FETCH_TIMEOUT)
+            response.raise_for_status()
+            response.json()  # reject a garbled body before it replaces good keys
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Firebase cert refresh from %s failed: %s", self.url, e)
+            return False
+
+        match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_CERT_MAX_AGE
+        with self._lock:
+            self.body = response.content
+            self.expires_at = time.time() + max_age
+            self.last_error = None
+        return True
+
+    def seconds_until_refresh(self) -> float:
+        # Floor at the retry interval so a short (or zero) max-age cannot
+        # turn the refresh loop into a busy loop against the key endpoint
+        return max(self.expires_at - CERT_REFRESH_MARGIN - time.time(), CERT_RETRY_INTERVAL)
+
+
+class _CertResponse(transport.Response):
+    def __init__(self, body: bytes):
+        self._body = body
+
+    @property
+    def status(self):
+        return 200
+
+    @property
+    def headers(self):
+        return {"Content-Type": "application/json"}
+
+    @property
+    def data(self):
+        return self._body
+
+
+class CachedCertRequest(transport.Request):
+    """
+    google-auth transport handed to the Firebase token verifier. Cert lookups
+    are answered from the store; anything else goes to the SDK's own request.
+    """
+
+    def __init__(self, store: CertStore, delegate: transport.Request):
+        self.store = store
+        self.delegate = delegate
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        if url == ID_TOKEN_CERT_URI and method == "GET":
+            if self.store.body is None:
+                self.store.refresh()  # cold start without warmup: fetch inline once
+            if self.store.body is not None:
+                return _CertResponse(self.store.body)
+        return self.delegate(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+
+cert_store = CertStore(FIREBASE_CERTS_URL)
+
+
+def install(app=None):
+    """
+    Route the Firebase Admin ID token verifier's cert fetches through the store.
+    """
+    verifier = auth._get_client(app)._token_verifier
+    if not isinstance(verifier.request, CachedCertRequest):
+        verifier.request = CachedCertRequest(cert_store, verifier.request)
+
+
+async def warmup():
+    install()
+    await run_blocking(cert_store.refresh)
+
+
+async def refresh_forever():
+    while True:
+        if cert_store.body is None:
+            delay = CERT_RETRY_INTERVAL
+        else:
+            delay = cert_store.seconds_until_refresh()
+        await asyncio.sleep(delay)
+        if not await run_blocking(cert_store.refresh):
+            await asyncio.sleep(CERT_RETRY_INTERVAL)
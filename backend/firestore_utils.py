@@ -0,0 +1,31 @@
+from typing import Iterable, Optional
+
+from executor import run_blocking
+
+
+def project(data: dict, field_paths: Iterable[str]) -> dict:
+    """
+    Apply a Firestore-style field mask (dotted paths allowed) to a dict.
+    """
+    projected = {}
+    for path in field_paths:
+        source, target = data, projected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    return projected
+
+
+async def read_document_fields(doc_ref, field_paths: Iterable[str]) -> Optional[dict]:
+    """
+    Fetch only `field_paths` of a document, so payload and decode cost do not
+    grow with the rest of it. Returns None when the document does not exist.
+    """
+    snapshot = await run_blocking(doc_ref.get, field_paths=list(field_paths))
+    return (snapshot.to_dict() or {}) if snapshot.exists else None
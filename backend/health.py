@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from firebase_admin import auth, firestore
-from typing import Optional
 import firebase_admin
 import os
 
+from auth import get_current_user_id
+from profile_cache import get_profile_fields, set_profile_fields
+
 # Initialize Firebase Admin app (if not done already)
 if not firebase_admin._apps:
     from firebase_admin import credentials
@@ -15,7 +16,6 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(cred_path)
     firebase_admin.initialize_app(cred)
 
-db = firestore.client()
 router = APIRouter()
 
 # Pydantic model for POST input
@@ -24,29 +24,17 @@ class BMIData(BaseModel):
     height: float
     bmi: float
 
-# Extract UID from token
-async def get_current_user_id(authorization: Optional[str] = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid or missing authorization token")
-    id_token = authorization.split("Bearer ")[1]
-    try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token["uid"]
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Token verification failed: {str(e)}")
-
 # Save BMI data
 @router.post("/health/bmi")
 async def submit_bmi(data: BMIData, uid: str = Depends(get_current_user_id)):
     try:
-        user_ref = db.collection("user_profiles").document(uid)
-        user_ref.set({
+        await set_profile_fields(uid, {
             "bmi_data": {
                 "weight": data.weight,
                 "height": data.height,
                 "bmi": data.bmi
             }
-        }, merge=True)
+        })
         return {"message": "BMI data saved successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -55,10 +43,9 @@ async def submit_bmi(data: BMIData, uid: str = Depends(get_current_user_id)):
 @router.get("/health/bmi")
 async def get_bmi(uid: str = Depends(get_current_user_id)):
     try:
-        user_ref = db.collection("user_profiles").document(uid)
-        doc = user_ref.get()
-        if doc.exists:
-            bmi_data = doc.to_dict().get("bmi_data")
+        profile = await get_profile_fields(uid, ["bmi_data"])
+        if profile is not None:
+            bmi_data = profile.get("bmi_data")
             if bmi_data:
                 return {"bmi_data": bmi_data}
             else:
@@ -70,12 +57,11 @@ async def get_bmi(uid: str = Depends(get_current_user_id)):
 @router.get("/health/exercise-suggestion")
 async def exercise_suggestion(uid: str = Depends(get_current_user_id)):
     try:
-        user_ref = db.collection("user_profiles").document(uid)
-        doc = user_ref.get()
-        if not doc.exists:
+        profile = await get_profile_fields(uid, ["bmi_data"])
+        if profile is None:
             raise HTTPException(status_code=404, detail="User profile not found")
 
-        bmi_data = doc.to_dict().get("bmi_data")
+        bmi_data = profile.get("bmi_data")
         if not bmi_data or "bmi" not in bmi_data:
             raise HTTPException(status_code=404, detail="BMI data not found")
 
@@ -0,0 +1,179 @@
+"""
+Declared MongoDB indexes for the recipes and comments collections.
+
+Created idempotently at startup; also usable as a CLI:
+
+    python indexes.py ensure    # create any missing index
+    python indexes.py verify    # fail if a declared index is missing or differs
+    python indexes.py explain   # fail if a hot query plans a COLLSCAN
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+import db
+
+INDEXES = {
+    "recipes": [
+        # (sort field, _id) pairs back keyset pagination in either direction
+        # and the user_id / category equality filters.
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_id"),
+        IndexModel([("category", ASCENDING), ("_id", ASCENDING)], name="category_id"),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_created_at_id",
+        ),
+        # Multikey: one entry per normalized ingredient name, the
+        # ingredient -> recipe inverted index behind the ingredients filter.
+        IndexModel(
+            [("ingredient_names", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="ingredient_names_created_at_id",
+        ),
+        IndexModel(
+            [("title", TEXT), ("category", TEXT), ("ingredients", TEXT)],
+            name="recipe_text",
+            weights={"title": 10, "category": 5, "ingredients": 2},
+        ),
+    ],
+    "comments": [
+        IndexModel([("recipe_id", ASCENDING), ("timestamp", DESCENDING)], name="recipe_id_timestamp"),
+    ],
+}
+
+# Superseded indexes, dropped by ensure_indexes when present
+OBSOLETE_INDEXES = {
+    "recipes": ["created_at_desc", "title_asc", "category_asc", "user_id_asc"],
+}
+
+# Query shapes served by the recipes router, as (label, collection, build)
+# where build(collection) returns the pymongo cursor to explain.
+CHECKED_QUERIES = [
+    *[
+        (
+            f"get_recipes sort_by={field}",
+            "recipes",
+            lambda c, field=field: c.find().sort([(field, DESCENDING), ("_id", DESCENDING)]).limit(10),
+        )
+        for field in ("created_at", "title", "category", "user_id")
+    ],
+    (
+        "get_recipes cursor",
+        "recipes",
+        lambda c: c.find({"$or": [{"created_at": {"$lt": datetime.utcnow()}}, {"created_at": None}]})
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(10),
+    ),
+    (
+        "get_my_recipes",
+        "recipes",
+        lambda c: c.find({"user_id": "uid"}).sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(50),
+    ),
+    ("search_recipes category", "recipes", lambda c: c.find({"category": "category"})),
+    (
+        "search_recipes keyword",
+        "recipes",
+        lambda c: c.find({"$text": {"$search": "paneer"}}, {"score": {"$meta": "textScore"}})
+        .sort([("score", {"$meta": "textScore"})]).limit(20),
+    ),
+    (
+        "get_recipes ingredients",
+        "recipes",
+        lambda c: c.find({"ingredient_names": {"$all": ["paneer", "spinach"]}})
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(10),
+    ),
+    ("get_comments", "comments", lambda c: c.find({"recipe_id": ObjectId()}).sort("timestamp", DESCENDING)),
+]
+
+
+def ensure_indexes(database=None):
+    """
+    Create every declared index. Existing indexes with the same spec are a no-op.
+    """
+    database = database if database is not None else db.get_database()
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = database[collection].index_information()
+        for name in names:
+            if name in existing:
+                database[collection].drop_index(name)
+    for collection, models in INDEXES.items():
+        database[collection].create_indexes(models)
+
+
+def verify_indexes(database=None):
+    """
+    Return a list of problems: declared indexes that are missing or whose keys differ.
+    """
+    database = database if database is not None else db.get_database()
+    problems = []
+    for collection, models in INDEXES.items():
+        existing = database[collection].index_information()
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            if name not in existing:
+                problems.append(f"{collection}.{name}: missing")
+            elif TEXT in spec["key"].values():
+                # Text indexes report their fields as weights, not keys
+                expected = {field: spec.get("weights", {}).get(field, 1) for field in spec["key"]}
+                if existing[name].get("weights") != expected:
+                    problems.append(f"{collection}.{name}: weights are {existing[name].get('weights')}, expected {expected}")
+            elif list(existing[name]["key"]) != list(spec["key"].items()):
+                problems.append(f"{collection}.{name}: key is {existing[name]['key']}, expected {list(spec['key'].items())}")
+    return problems
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_queries(database=None):
+    """
+    Explain every checked query; return (label, stages, uses_collscan) tuples.
+    """
+    database = database if database is not None else db.get_database()
+    results = []
+    for label, collection, build in CHECKED_QUERIES:
+        plan = build(database[collection]).explain()["queryPlanner"]["winningPlan"]
+        stages = list(_plan_stages(plan))
+        results.append((label, stages, "COLLSCAN" in stages))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["ensure", "verify", "explain"])
+    args = parser.parse_args(argv)
+
+    if args.command == "ensure":
+        ensure_indexes()
+        print("Indexes ensured.")
+        return 0
+
+    if args.command == "verify":
+        problems = verify_indexes()
+        for problem in problems:
+            print(f"FAIL {problem}")
+        if not problems:
+            print("All declared indexes present.")
+        return 1 if problems else 0
+
+    failed = False
+    for label, stages, uses_collscan in explain_queries():
+        failed = failed or uses_collscan
+        print(f"{'FAIL' if uses_collscan else 'ok  '} {label}: {' <- '.join(stages)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Parse free-text recipe ingredients into structured items.
+
+"2 cups basmati rice, 200g paneer (cubed), salt to taste" becomes
+
+    [{"name": "basmati rice", "quantity": 2.0, "unit": "cup", "text": "2 cups basmati rice"},
+     {"name": "paneer", "quantity": 200.0, "unit": "g", "text": "200g paneer (cubed)"},
+     {"name": "salt", "quantity": None, "unit": None, "text": "salt to taste"}]
+
+The normalized names are stored alongside as `ingredient_names`, a multikey
+index that serves as the ingredient -> recipe inverted index.
+"""
+import re
+from typing import List, Optional
+
+UNITS = {
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tbs": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "g": "g", "gm": "g", "gms": "g", "gram": "g", "grams": "g",
+    "kg": "kg", "kgs": "kg", "kilogram": "kg", "kilograms": "kg",
+    "mg": "mg",
+    "ml": "ml", "millilitre": "ml", "milliliter": "ml", "millilitres": "ml", "milliliters": "ml",
+    "l": "l", "litre": "l", "liter": "l", "litres": "l", "liters": "l",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "pinch": "pinch", "pinches": "pinch",
+    "dash": "dash",
+    "clove": "clove", "cloves": "clove",
+    "piece": "piece", "pieces": "piece", "pc": "piece", "pcs": "piece",
+    "slice": "slice", "slices": "slice",
+    "bunch": "bunch", "bunches": "bunch",
+    "can": "can", "cans": "can",
+    "packet": "packet", "packets": "packet",
+    "sprig": "sprig", "sprigs": "sprig",
+    "handful": "handful",
+}
+
+# Words that describe preparation or amount rather than the ingredient
+DESCRIPTORS = {
+    "chopped", "diced", "sliced", "minced", "grated", "crushed", "ground", "beaten",
+    "boiled", "peeled", "cubed", "finely", "roughly", "thinly", "fresh", "freshly",
+    "large", "medium", "small", "optional", "to", "taste", "as", "needed", "required",
+    "of", "a", "an", "some", "few", "and", "or", "for", "garnish", "about",
+}
+
+UNICODE_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅛": 0.125}
+
+# Commas inside parentheses ("paneer (cubed, fresh)") do not split
+_SEPARATORS = re.compile(r"[,;\n]+(?![^(]*\))")
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+# `whole` must not end where a fraction's numerator does, or "1/2" parses
+# as 1 followed by an unmatched "/2"
+_QUANTITY = re.compile(
+    r"^\s*(?P<whole>\d+(?:\.\d+)?(?![\d/]))?\s*(?:(?P<num>\d+)/(?P<den>\d+)|(?P<uni>[" + "".join(UNICODE_FRACTIONS) + r"]))?"
+    r"(?:\s*(?:-|to)\s*\d+(?:\.\d+)?)?"
+)
+_WORD = re.compile(r"[a-z]+")
+
+IRREGULAR_PLURALS = {"leaves": "leaf", "halves": "half", "chillies": "chilli", "cloves": "clove"}
+
+
+def _singular(word: str) -> str:
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase, drop descriptors and punctuation, and singularize each word,
+    so "Fresh Tomatoes" and "tomato" normalize alike.
+    """
+    words = [word for word in _WORD.findall(_PARENTHETICAL.sub(" ", name.lower())) if word not in DESCRIPTORS]
+    # Unit words are noise ("garlic cloves") unless they are the whole name ("cloves")
+    words = [word for word in words if word not in UNITS] or words
+    return " ".join(_singular(word) for word in words)
+
+
+def _parse_quantity(text: str):
+    match = _QUANTITY.match(text)
+    quantity = None
+    if match.group("whole"):
+        quantity = float(match.group("whole"))
+    if match.group("num") and int(match.group("den")):
+        quantity = (quantity or 0) + int(match.group("num")) / int(match.group("den"))
+    if match.group("uni"):
+        quantity = (quantity or 0) + UNICODE_FRACTIONS[match.group("uni")]
+    return quantity, text[match.end():] if quantity is not None else text
+
+
+def parse_ingredient(text: str) -> Optional[dict]:
+    """
+    Parse one ingredient phrase; None when nothing is left of it after
+    dropping quantities, units and descriptors.
+    """
+    text = text.strip()
+    quantity, rest = _parse_quantity(text)
+    unit = None
+    first = re.match(r"\s*([a-zA-Z]+)\.?\b", rest)
+    if first and first.group(1).lower() in UNITS:
+        unit = UNITS[first.group(1).lower()]
+        rest = rest[first.end():]
+    else:
+        # Trailing amounts such as "paneer 200g"
+        trailing = re.search(r"(\d+(?:\.\d+)?)\s*([a-zA-Z]+)\s*$", rest)
+        if quantity is None and trailing and trailing.group(2).lower() in UNITS:
+            quantity, unit = float(trailing.group(1)), UNITS[trailing.group(2).lower()]
+            rest = rest[:trailing.start()]
+    name = normalize_name(rest)
+    if not name and unit is not None and first is not None:
+        # "4 cloves": the unit word was the ingredient itself
+        name, unit = normalize_name(first.group(1)), None
+    if not name:
+        return None
+    return {"name": name, "quantity": quantity, "unit": unit, "text": text}
+
+
+def parse_ingredients(text: str) -> List[dict]:
+    """
+    Split an ingredients string on commas, semicolons and newlines and parse
+    each phrase.
+    """
+    items = []
+    for phrase in _SEPARATORS.split(text or ""):
+        item = parse_ingredient(phrase)
+        if item is not None:
+            items.append(item)
+    return items
+
+
+def normalize_names(names) -> List[str]:
+    """
+    Normalize query-side ingredient names (e.g. a comma-separated filter),
+    dropping empties and duplicates while keeping order.
+    """
+    if isinstance(names, str):
+        names = names.split(",")
+    return list(dict.fromkeys(name for name in (normalize_name(n) for n in names) if name))
+
+
+def ingredient_fields(text: str) -> dict:
+    """
+    Structured fields stored next to the raw `ingredients` string.
+    """
+    items = parse_ingredients(text)
+    return {
+        "ingredient_items": items,
+        "ingredient_names": list(dict.fromkeys(item["name"] for item in items)),
+    }
@@ -2,22 +2,27 @@ from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
-import os
+from contextlib import asynccontextmanager
+import asyncio
 
 # Load environment variables
 load_dotenv()
 
+import db
+import executor
+import firebase_certs
+import indexes
+import metrics
+import write_behind
+from executor import run_blocking
+from pantry import pantry_index
+from sessions import ServerSessionMiddleware, session_store
+
 # Setup Jinja templates
 templates = Jinja2Templates(directory="../frontend/html")
 
-# Check for secret key
-SECRET_KEY = os.getenv("SESSION_SECRET")
-if not SECRET_KEY:
-    raise Exception("SESSION_SECRET not set in environment variables!")
-
 # CORS settings
 origins = [
     "http://localhost:3000",
@@ -28,15 +33,33 @@ origins = [
     "http://127.0.0.1:8000",
 ]
 
+# Startup / shutdown hooks
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db.connect()
+    await firebase_certs.warmup()
+    await run_blocking(session_store.ensure_indexes)
+    await run_blocking(indexes.ensure_indexes)
+    cert_refresher = asyncio.create_task(firebase_certs.refresh_forever())
+    write_behind.start_all()
+    pantry_index.start(db.get_async_collection("recipes"))
+    yield
+    cert_refresher.cancel()
+    await pantry_index.stop()
+    await write_behind.drain_all()
+    executor.shutdown(wait=True)
+    db.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="SwaadSathi API",
     description="A Full Stack Recipe & Health Assistant App",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Middleware
-app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
+app.add_middleware(ServerSessionMiddleware, store=session_store)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -71,6 +94,11 @@ app.include_router(contact_router)
 async def root():
     return {"message": "Welcome to the SwaadSathi API 🚀"}
 
+# Cache hit rates and other runtime counters
+@app.get("/api/metrics", tags=["Root"])
+async def runtime_metrics():
+    return metrics.snapshot()
+
 # Frontend homepage route
 @app.get("/", response_class=HTMLResponse)
 async def homepage(request: Request):
@@ -0,0 +1,11 @@
+# Process-wide registry of metric sources. Each source is a zero-argument
+# callable returning a JSON-able dict, sampled when /api/metrics is read.
+_sources = {}
+
+
+def register(name, source):
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    return {name: source() for name, source in _sources.items()}
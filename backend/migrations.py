@@ -0,0 +1,86 @@
+"""
+One-off data backfills for the recipes collections.
+
+    python migrations.py comment-counts   # set recipes.comment_count from comments
+    python migrations.py ingredients      # parse recipes.ingredients into items and names
+"""
+import argparse
+import sys
+
+from pymongo import UpdateOne
+
+import db
+from etags import VERSIONS_COLLECTION
+from ingredients import ingredient_fields
+
+BATCH_SIZE = 1000
+
+
+def _bump_recipes_version(database):
+    # Invalidate list ETags (see etags.py) after rewriting recipes
+    database[VERSIONS_COLLECTION].update_one({"_id": "recipes"}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def backfill_comment_counts(database=None) -> int:
+    """
+    Set comment_count on every recipe from the comments collection.
+    Returns the number of recipes updated.
+    """
+    database = database if database is not None else db.get_database()
+    recipes = database["recipes"]
+    updated = 0
+    batch = []
+    counts = database["comments"].aggregate([{"$group": {"_id": "$recipe_id", "count": {"$sum": 1}}}])
+    for row in counts:
+        batch.append(UpdateOne({"_id": row["_id"]}, {"$set": {"comment_count": row["count"]}, "$inc": {"version": 1}}))
+        if len(batch) >= BATCH_SIZE:
+            updated += recipes.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += recipes.bulk_write(batch, ordered=False).modified_count
+    updated += recipes.update_many(
+        {"comment_count": {"$exists": False}}, {"$set": {"comment_count": 0}, "$inc": {"version": 1}}
+    ).modified_count
+    _bump_recipes_version(database)
+    return updated
+
+
+def backfill_ingredients(database=None) -> int:
+    """
+    Set ingredient_items and ingredient_names on every recipe from its raw
+    ingredients string, so older recipes match ingredient filters.
+    Returns the number of recipes updated.
+    """
+    database = database if database is not None else db.get_database()
+    recipes = database["recipes"]
+    updated = 0
+    batch = []
+    for recipe in recipes.find({}, {"ingredients": 1}).batch_size(BATCH_SIZE):
+        fields = ingredient_fields(recipe.get("ingredients") if isinstance(recipe.get("ingredients"), str) else "")
+        batch.append(UpdateOne({"_id": recipe["_id"]}, {"$set": fields, "$inc": {"version": 1}}))
+        if len(batch) >= BATCH_SIZE:
+            updated += recipes.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += recipes.bulk_write(batch, ordered=False).modified_count
+    _bump_recipes_version(database)
+    return updated
+
+
+MIGRATIONS = {
+    "comment-counts": backfill_comment_counts,
+    "ingredients": backfill_ingredients,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    args = parser.parse_args(argv)
+    updated = MIGRATIONS[args.migration]()
+    print(f"{args.migration}: {updated} document(s) updated.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import base64
+import binascii
+
+from bson import json_util
+from fastapi import HTTPException
+
+
+def sort_spec(sort_by: str, direction: int):
+    """
+    Sort on the requested field with _id as a unique tiebreaker, so keyset
+    pages are stable even when many documents share a sort value.
+    """
+    return [(sort_by, direction), ("_id", direction)]
+
+
+def encode_cursor(sort_by: str, direction: int, last_doc: dict) -> str:
+    """
+    Opaque token for the page after `last_doc` (a raw document with `_id`).
+    """
+    payload = json_util.dumps({"s": sort_by, "d": direction, "v": last_doc.get(sort_by), "id": last_doc["_id"]})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort_by: str, direction: int):
+    """
+    Return the (value, _id) pair stored in a cursor. The cursor must have
+    been issued for the same sort field and direction.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, last_id = payload["v"], payload["id"]
+        issued_for = (payload["s"], payload["d"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if issued_for != (sort_by, direction):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by/sort_order")
+    return value, last_id
+
+
+def keyset_filter(sort_by: str, direction: int, value, last_id) -> dict:
+    """
+    Filter matching the documents strictly after (value, last_id) in
+    sort_spec order. Mongo sorts null/missing below every other value, and
+    range operators do not cross types, so nulls get their own clauses.
+    """
+    op = "$gt" if direction == 1 else "$lt"
+    same_value = {sort_by: value, "_id": {op: last_id}}
+    if value is None:
+        if direction == 1:
+            return {"$or": [same_value, {sort_by: {"$ne": None}}]}
+        return same_value
+    after = [same_value, {sort_by: {op: value}}]
+    if direction == -1:
+        after.append({sort_by: None})
+    return {"$or": after}
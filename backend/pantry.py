@@ -0,0 +1,263 @@
+"""
+In-memory ingredient bitsets for "cook with what I have" matching.
+
+Every recipe gets a dense slot number. Each normalized ingredient name maps
+to the set of slots whose ingredient_names contain it: a Python int used as
+a bitset for common ingredients, or a sorted array of slots for rare ones.
+Recipes are also grouped into one bitset per
+ingredient count.
+
+Scoring a pantry adds its ingredients' bitsets into bit-sliced counters, so
+"how many pantry ingredients does each recipe have" is computed for every
+recipe at once with a few dozen big-int operations. Intersecting those
+counters with the per-size bitsets yields recipes in ranking order without
+visiting them one by one.
+"""
+import asyncio
+import logging
+import os
+import time
+from array import array
+from typing import Iterable, List, Tuple
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+PANTRY_REFRESH_SECONDS = int(os.getenv("PANTRY_REFRESH_SECONDS", "600"))
+PANTRY_BUILD_BATCH_SIZE = 5000
+MAX_INGREDIENTS = 255   # per-recipe counts are stored as bytes
+# Ingredients in at least 1/BITSET_DENSITY of recipes are kept as bitsets.
+# Sparser ones stay arrays and are turned into bitsets per query, which
+# costs a Python-level loop over their slots.
+BITSET_DENSITY = 128
+
+
+def _to_bitset(slots: Iterable[int], slot_count: int) -> int:
+    bits = bytearray((slot_count + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _log_build_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Pantry index build failed", exc_info=task.exception())
+
+
+class PantryIndex:
+    def __init__(self):
+        self._ids = []              # slot -> recipe _id
+        self._sizes = array("B")    # slot -> distinct ingredient count
+        self._slots = {}            # recipe _id -> live slot
+        self._postings = {}         # ingredient name -> bitset int or array of slots
+        self._by_size = {}          # ingredient count -> bitset of live slots
+        self._pending = None        # writes seen while a rebuild is running
+        self._rebuild = None        # the running (or last) build task
+        self.built_at = None
+        self.build_seconds = None
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _append(self, recipe_id, names: Iterable[str]) -> int:
+        names = set(names)
+        slot = len(self._ids)
+        self._ids.append(recipe_id)
+        self._sizes.append(min(len(names), MAX_INGREDIENTS))
+        self._slots[recipe_id] = slot
+        for name in names:
+            postings = self._postings.get(name)
+            if postings is None:
+                self._postings[name] = array("I", (slot,))
+            elif isinstance(postings, int):
+                self._postings[name] = postings | (1 << slot)
+            else:
+                postings.append(slot)
+        return slot
+
+    def _freeze(self):
+        # After a bulk load: switch common ingredients to bitsets and group
+        # live recipes by size.
+        slot_count = len(self._ids)
+        for name, postings in self._postings.items():
+            if not isinstance(postings, int) and len(postings) * BITSET_DENSITY >= slot_count:
+                self._postings[name] = _to_bitset(postings, slot_count)
+        by_size = {}
+        for slot in self._slots.values():
+            if self._sizes[slot]:
+                by_size.setdefault(self._sizes[slot], []).append(slot)
+        self._by_size = {size: _to_bitset(slots, slot_count) for size, slots in by_size.items()}
+
+    def _put(self, recipe_id, names: Iterable[str]):
+        self._remove(recipe_id)
+        slot = self._append(recipe_id, names)
+        size = self._sizes[slot]
+        if size:
+            self._by_size[size] = self._by_size.get(size, 0) | (1 << slot)
+
+    def _remove(self, recipe_id):
+        # Ingredient postings are append-only; dropping the slot from its
+        # size bitset is enough to exclude it, and the next rebuild
+        # compacts it away.
+        slot = self._slots.pop(recipe_id, None)
+        if slot is not None and self._sizes[slot]:
+            self._by_size[self._sizes[slot]] &= ~(1 << slot)
+
+    def put(self, recipe_id, names: Iterable[str]):
+        """
+        Index (or re-index) one recipe after a local write.
+        """
+        names = list(names)
+        if self._pending is not None:
+            self._pending.append((recipe_id, names))
+        self._put(recipe_id, names)
+
+    def remove(self, recipe_id):
+        if self._pending is not None:
+            self._pending.append((recipe_id, None))
+        self._remove(recipe_id)
+
+    @classmethod
+    def _from_rows(cls, ids, names) -> "PantryIndex":
+        index = cls()
+        for recipe_id, recipe_names in zip(ids, names):
+            index._append(recipe_id, recipe_names)
+        index._freeze()
+        return index
+
+    async def _build(self, collection):
+        started = time.perf_counter()
+        self._pending = []
+        try:
+            # _id order is creation order, which match() uses to break ties.
+            # Only the fetch runs on the event loop; building the bitsets is
+            # CPU work and goes to the I/O pool.
+            cursor = collection.find({}, {"ingredient_names": 1}).sort("_id", 1).batch_size(PANTRY_BUILD_BATCH_SIZE)
+            # Flat lists of ids and name tuples keep the number of objects the
+            # garbage collector has to walk low while the scan runs
+            ids, names = [], []
+            async for recipe in cursor:
+                ids.append(recipe["_id"])
+                names.append(tuple(recipe.get("ingredient_names") or ()))
+            fresh = await run_blocking(PantryIndex._from_rows, ids, names)
+            del ids, names
+            # Replay writes that raced the build, then swap in the new index
+            for recipe_id, names in self._pending:
+                if names is None:
+                    fresh._remove(recipe_id)
+                else:
+                    fresh._put(recipe_id, names)
+        finally:
+            self._pending = None
+        self._ids, self._sizes, self._slots = fresh._ids, fresh._sizes, fresh._slots
+        self._postings, self._by_size = fresh._postings, fresh._by_size
+        self.built_at = time.time()
+        self.build_seconds = round(time.perf_counter() - started, 3)
+
+    def _start_build(self, collection) -> asyncio.Task:
+        # One build at a time; callers share the running one
+        if self._rebuild is None or self._rebuild.done():
+            self._rebuild = asyncio.create_task(self._build(collection), name="pantry-index-build")
+            self._rebuild.add_done_callback(_log_build_failure)
+        return self._rebuild
+
+    def start(self, collection):
+        """
+        Begin the first build in the background; called from the app lifespan
+        so the scan does not wait for the first pantry request.
+        """
+        self._start_build(collection)
+
+    async def stop(self):
+        if self._rebuild is not None and not self._rebuild.done():
+            self._rebuild.cancel()
+            try:
+                await self._rebuild
+            except asyncio.CancelledError:
+                pass
+
+    async def ensure_fresh(self, collection):
+        """
+        Wait for the first build (started by start(), or here when the
+        lifespan did not run) and rebuild in the background once the index is
+        older than PANTRY_REFRESH_SECONDS, serving the old one meanwhile.
+        """
+        if self.built_at is None:
+            # Shielded so a disconnecting client does not cancel the shared build
+            await asyncio.shield(self._start_build(collection))
+        elif time.time() - self.built_at > PANTRY_REFRESH_SECONDS:
+            self._start_build(collection)
+
+    def match(self, names: List[str], limit: int, max_missing: int = None) -> List[Tuple[object, int, int]]:
+        """
+        Rank recipes sharing at least one ingredient with `names` by coverage
+        (share of the recipe's ingredients on hand), then fewest missing,
+        then newest. Returns (recipe_id, matched, total) tuples, best first.
+        """
+        slot_count = len(self._ids)
+        bitsets = []
+        for name in set(names):
+            postings = self._postings.get(name)
+            if postings is not None:
+                bitsets.append(postings if isinstance(postings, int) else _to_bitset(postings, slot_count))
+        if not bitsets:
+            return []
+
+        # counters[i] holds bit i of every recipe's matched count
+        counters = []
+        any_match = 0
+        for bits in bitsets:
+            any_match |= bits
+            carry = bits
+            for i, counter in enumerate(counters):
+                counters[i], carry = counter ^ carry, counter & carry
+                if not carry:
+                    break
+            if carry:
+                counters.append(carry)
+
+        matched_exactly = {}
+
+        def with_matched(count: int) -> int:
+            if count >> len(counters):
+                return 0   # more than any recipe reached
+            if count not in matched_exactly:
+                bits = any_match
+                for i, counter in enumerate(counters):
+                    bits = bits & counter if (count >> i) & 1 else bits & ~counter
+                matched_exactly[count] = bits
+            return matched_exactly[count]
+
+        # Every (recipe size, matched count) group, best ranked first
+        groups = sorted(
+            (
+                (matched / size, matched - size, matched, size)
+                for size, live in self._by_size.items() if live
+                for matched in range(1, min(size, len(bitsets)) + 1)
+                if max_missing is None or size - matched <= max_missing
+            ),
+            reverse=True,
+        )
+        ranked = []
+        for _, _, matched, size in groups:
+            bits = self._by_size[size] & with_matched(matched)
+            while bits and len(ranked) < limit:
+                slot = bits.bit_length() - 1   # highest slot = newest
+                bits ^= 1 << slot
+                ranked.append((self._ids[slot], matched, size))
+            if len(ranked) >= limit:
+                break
+        return ranked
+
+    def stats(self) -> dict:
+        return {
+            "recipes": len(self._slots),
+            "ingredients": len(self._postings),
+            "bitset_ingredients": sum(isinstance(postings, int) for postings in self._postings.values()),
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+        }
+
+
+pantry_index = PantryIndex()
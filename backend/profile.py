@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from firebase_admin import auth, firestore
 import firebase_admin
 import os
 
+from auth import get_current_user_id
+from profile_cache import get_profile as get_cached_profile, set_profile_fields
+
 # Initialize Firebase Admin SDK
 if not firebase_admin._apps:
     from firebase_admin import credentials
@@ -15,9 +17,6 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(cred_path)
     firebase_admin.initialize_app(cred)
 
-# Firestore client
-db = firestore.client()
-
 # API router
 router = APIRouter(prefix="/profile", tags=["User Profile"])
 
@@ -32,20 +31,6 @@ class UserProfile(BaseModel):
     age: Optional[int] = None
     gender: Optional[str] = None
 
-# ==============================
-# === Auth Dependency Utils ===
-# ==============================
-
-async def get_current_user_id(authorization: Optional[str] = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid or missing authorization token")
-    id_token = authorization.split("Bearer ")[1]
-    try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token["uid"]
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Token verification failed: {str(e)}")
-
 # =========================
 # === Profile Endpoints ===
 # =========================
@@ -53,11 +38,10 @@ async def get_current_user_id(authorization: Optional[str] = Header(None)):
 @router.get("/")
 async def get_profile(uid: str = Depends(get_current_user_id)):
     try:
-        user_ref = db.collection("user_profiles").document(uid)
-        doc = user_ref.get()
-        if not doc.exists:
+        profile = await get_cached_profile(uid)
+        if profile is None:
             raise HTTPException(status_code=404, detail="Profile not found")
-        return {"profile": doc.to_dict()}
+        return {"profile": profile}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching profile: {str(e)}")
 
@@ -68,8 +52,7 @@ async def update_profile(data: UserProfile, uid: str = Depends(get_current_user_
         if not update_data:
             raise HTTPException(status_code=400, detail="No data provided for update")
 
-        user_ref = db.collection("user_profiles").document(uid)
-        user_ref.set(update_data, merge=True)
+        await set_profile_fields(uid, update_data)
         return {"message": "Profile updated successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating profile: {str(e)}")
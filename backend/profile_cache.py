@@ -0,0 +1,166 @@
+import copy
+import os
+from typing import Iterable
+
+from firebase_admin import firestore
+
+import metrics
+from cache import TTLCache
+from executor import run_blocking
+from firestore_utils import project, read_document_fields
+
+# Read-through cache for user_profiles/{uid}. Writers go through
+# set_profile_fields so cached entries are updated in place; other workers
+# see a change after at most PROFILE_CACHE_TTL seconds.
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+
+PROFILES_COLLECTION = "user_profiles"
+
+profiles = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+metrics.register("profile_cache", profiles.stats)
+
+_MISS = object()
+_ABSENT = object()  # cached "document does not exist"
+
+
+class _CachedProfile:
+    # `fields` is None when `data` holds the whole document, otherwise the
+    # set of top-level fields that were read (possibly absent from `data`).
+    __slots__ = ("data", "fields")
+
+    def __init__(self, data, fields=None):
+        self.data = data
+        self.fields = fields
+
+    def covers(self, fields=None) -> bool:
+        # fields=None asks for the whole document
+        if self.fields is None:
+            return True
+        return fields is not None and self.fields.issuperset(fields)
+
+
+def _doc_ref(uid: str):
+    # Resolved per call: this module is imported before the routers
+    # initialize the Firebase app, and firestore.client() caches per app.
+    return firestore.client().collection(PROFILES_COLLECTION).document(uid)
+
+
+def _deep_merge(target: dict, fields: dict):
+    # Mirrors Firestore's set(..., merge=True) for nested maps
+    for key, value in fields.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+# uid -> [reads in flight, write generation]. Kept only while a read of the
+# uid is in flight; a read whose generation changed before it finished saw
+# the document before a write and must not be cached.
+_in_flight = {}
+
+
+def _begin_read(uid: str) -> int:
+    entry = _in_flight.setdefault(uid, [0, 0])
+    entry[0] += 1
+    return entry[1]
+
+
+def _end_read(uid: str, generation: int) -> bool:
+    entry = _in_flight[uid]
+    entry[0] -= 1
+    if not entry[0]:
+        del _in_flight[uid]
+    return entry[1] == generation
+
+
+def _bump_generation(uid: str):
+    entry = _in_flight.get(uid)
+    if entry is not None:
+        entry[1] += 1
+
+
+def _answers(fields=None):
+    # Lookups that a partial entry cannot answer count as cache misses
+    return lambda cached: cached is _ABSENT or cached.covers(fields)
+
+
+async def get_profile(uid: str):
+    """
+    Return a copy of the user's profile document, or None if it does not exist.
+    """
+    cached = profiles.get(uid, _MISS, usable=_answers())
+    if cached is _ABSENT:
+        return None
+    if cached is _MISS or not cached.covers():
+        generation = _begin_read(uid)
+        try:
+            doc = await run_blocking(_doc_ref(uid).get)
+        finally:
+            fresh = _end_read(uid, generation)
+        if not doc.exists:
+            if fresh:
+                profiles.set(uid, _ABSENT)
+            return None
+        cached = _CachedProfile(doc.to_dict())
+        if fresh:
+            profiles.set(uid, cached)
+    return copy.deepcopy(cached.data)
+
+
+async def get_profile_fields(uid: str, fields: Iterable[str]):
+    """
+    Return only the given top-level fields of the profile (a field-masked
+    read on a miss), or None if the document does not exist.
+    """
+    fields = frozenset(fields)
+    cached = profiles.get(uid, _MISS, usable=_answers(fields))
+    if cached is _ABSENT:
+        return None
+    if cached is _MISS or not cached.covers(fields):
+        generation = _begin_read(uid)
+        try:
+            data = await read_document_fields(_doc_ref(uid), sorted(fields))
+        finally:
+            fresh = _end_read(uid, generation)
+        if data is None:
+            if fresh:
+                profiles.set(uid, _ABSENT)
+            return None
+        if cached is _MISS or not fresh:
+            if fresh:
+                profiles.set(uid, _CachedProfile(data, set(fields)))
+            return copy.deepcopy(project(data, fields))
+        # Merged in place so the entry keeps the deadline of its first read
+        cached.data.update(data)
+        cached.fields |= fields
+    return copy.deepcopy(project(cached.data, fields))
+
+
+async def set_profile_fields(uid: str, fields: dict):
+    """
+    Merge `fields` into the profile document and into the cached copy.
+    """
+    try:
+        await run_blocking(_doc_ref(uid).set, fields, merge=True)
+    except Exception:
+        _bump_generation(uid)
+        profiles.pop(uid)
+        raise
+    _bump_generation(uid)
+
+    cached = profiles.peek(uid, _MISS)
+    if cached is _ABSENT:
+        profiles.set(uid, _CachedProfile(copy.deepcopy(fields)))
+    elif cached is not _MISS:
+        if cached.fields is not None:
+            for key, value in fields.items():
+                # A map merged into an unread field leaves its other keys unknown
+                if key not in cached.fields and isinstance(value, dict):
+                    continue
+                cached.fields.add(key)
+                _deep_merge(cached.data, {key: value})
+        else:
+            _deep_merge(cached.data, fields)
+
@@ -1,26 +1,76 @@
-from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, Request, Query, Path, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, Request, Response, Query, Path, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from typing import List
-from pymongo import MongoClient
+from typing import List, Literal, Optional
 from bson import ObjectId
 import os
 import shutil
+import time
 from datetime import datetime
-from auth import get_current_user_id
+from auth import get_current_user_id, get_identity, require_admin
+from bulk_io import detect_format, iter_records, iter_zip_records, open_zip_upload
+import metrics
+from cache import TTLCache
+from db import get_async_collection
+from etags import bump_collection_version, collection_version, etag_matches, list_etag, make_etag, not_modified, set_etag
+from executor import run_blocking
+from ingredients import ingredient_fields, normalize_names
+from pantry import pantry_index
+from pagination import decode_cursor, encode_cursor, keyset_filter, sort_spec
+from streaming import STREAM_BATCH_SIZE, csv_lines, gzip_chunks, ndjson_lines
 from dotenv import load_dotenv
 import uuid
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from pymongo.errors import BulkWriteError
 
 load_dotenv()
 
 router = APIRouter()
 
-# Connect to MongoDB
-client = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
-db = client["swaadsathi"]
-recipes_collection = db["recipes"]
-comments_collection = db["comments"]  # Comments collection
+# Motor collections on the shared, lifespan-managed MongoDB client
+def recipes_collection():
+    return get_async_collection("recipes")
+
+def comments_collection():
+    return get_async_collection("comments")
+
+# Exact total recipe count, cached briefly and kept current by this
+# worker's inserts and deletes
+RECIPE_COUNT_TTL = int(os.getenv("RECIPE_COUNT_TTL", "30"))
+recipe_counts = TTLCache(maxsize=1, ttl=RECIPE_COUNT_TTL)
+metrics.register("recipe_count_cache", recipe_counts.stats)
+metrics.register("pantry_index", pantry_index.stats)
+
+async def count_recipes() -> int:
+    count = recipe_counts.get("total")
+    if count is None:
+        count = await recipes_collection().count_documents({})
+        recipe_counts.set("total", count)
+    return count
+
+def adjust_recipe_count(delta: int):
+    recipe_counts.incr("total", delta)
+
+# Field selection for list endpoints. The "card" view carries what list
+# pages render; long text such as steps and ingredients is opt-in.
+RECIPE_FIELDS = {
+    "title", "ingredients", "ingredient_items", "ingredient_names", "steps", "category",
+    "image_url", "user_id", "created_at", "updated_at", "version", "comment_count"
+}
+CARD_FIELDS = ("title", "category", "image_url", "user_id", "created_at", "comment_count")
+
+def recipe_projection(fields: str, *required: str) -> Optional[dict]:
+    """
+    Mongo projection for a `fields` query value; None means whole documents.
+    `required` fields (e.g. the sort key) are always included.
+    """
+    if fields == "full":
+        return None
+    names = CARD_FIELDS if fields == "card" else [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = set(names) - RECIPE_FIELDS
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown)) or fields}")
+    return {name: 1 for name in (*names, *required)}
 
 # Directory to store uploaded images
 UPLOAD_DIR = "uploaded_images"
@@ -37,6 +87,26 @@ def save_uploaded_image(image: UploadFile) -> str:
 
 # -------------------- Recipe APIs --------------------
 
+# Build the stored document for a new recipe. The raw ingredients string is
+# kept as entered; its parsed items and names (see ingredients.py) back the
+# ingredient filters. `version` goes up on every change to the recipe and
+# its comments, and keys the detail ETag.
+def new_recipe_doc(title, ingredients, steps, category, image_url, user_id) -> dict:
+    now = datetime.utcnow()
+    return {
+        "title": title,
+        "ingredients": ingredients,
+        **ingredient_fields(ingredients),
+        "steps": steps,
+        "category": category,
+        "image_url": image_url,
+        "user_id": user_id,
+        "created_at": now,
+        "updated_at": now,
+        "version": 1,
+        "comment_count": 0
+    }
+
 # Add a new recipe
 @router.post("/add_recipe", status_code=status.HTTP_201_CREATED)
 async def add_recipe(
@@ -55,81 +125,372 @@ async def add_recipe(
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Image save failed: {str(e)}")
 
-    recipe = {
-        "title": title,
-        "ingredients": ingredients,
-        "steps": steps,
-        "category": category,
-        "image_url": image_url,
-        "user_id": user_id,
-        "created_at": datetime.utcnow()
-    }
+    recipe = new_recipe_doc(title, ingredients, steps, category, image_url, user_id)
 
-    result = recipes_collection.insert_one(recipe)
+    result = await recipes_collection().insert_one(recipe)
+    adjust_recipe_count(1)
+    pantry_index.put(result.inserted_id, recipe["ingredient_names"])
+    await bump_collection_version("recipes")
     return JSONResponse(status_code=201, content={"message": "Recipe added", "id": str(result.inserted_id)})
 
 
-# Get all recipes with pagination and sorting
+# -------------------- Bulk import --------------------
+
+IMPORT_BATCH_SIZE = int(os.getenv("RECIPE_IMPORT_BATCH_SIZE", "1000"))
+MAX_IMPORT_IMAGE_BYTES = 10 * 1024 * 1024
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+def _import_text(row: dict, field: str) -> str:
+    value = row.get(field)
+    if isinstance(value, list):
+        value = ", ".join(str(item).strip() for item in value)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{field} is required")
+    return value.strip()
+
+def _save_zip_image(archive, member: str) -> str:
+    try:
+        info = archive.getinfo(member)
+    except KeyError:
+        raise ValueError(f"image {member!r} not found in zip")
+    ext = os.path.splitext(member)[1].lower()
+    if ext not in IMAGE_EXTENSIONS:
+        raise ValueError(f"image {member!r} is not a supported image type")
+    if info.file_size > MAX_IMPORT_IMAGE_BYTES:
+        raise ValueError(f"image {member!r} is larger than {MAX_IMPORT_IMAGE_BYTES} bytes")
+    unique_filename = f"{uuid.uuid4().hex}{ext}"
+    with archive.open(info) as source, open(os.path.join(UPLOAD_DIR, unique_filename), "wb") as target:
+        shutil.copyfileobj(source, target)
+    return f"/uploaded_images/{unique_filename}"
+
+def _import_image_url(value, is_admin: bool) -> Optional[str]:
+    # Rows may point at an already uploaded image; admins may also link
+    # http(s) images. Anything else (javascript:, data:, ...) is refused.
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        name = value[len("/uploaded_images/"):] if value.startswith("/uploaded_images/") else None
+        if name and name == os.path.basename(name) and name not in (".", ".."):
+            return value
+        if is_admin and value.lower().startswith(("https://", "http://")):
+            return value
+    raise ValueError("image_url must be an /uploaded_images/ path")
+
+def _prepare_import_batch(rows, archive, user_id, is_admin):
+    """
+    Validate rows, then extract images for the valid ones (blocking).
+    Returns the documents to insert, their row numbers, whether each one's
+    image was extracted here, and per-row errors.
+    """
+    docs, row_numbers, extracted, errors = [], [], [], []
+    for row_number, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            fields = [_import_text(row, field) for field in ("title", "ingredients", "steps", "category")]
+            image_url = _import_image_url(row.get("image_url"), is_admin)
+            from_zip = archive is not None and bool(row.get("image"))
+            if from_zip:
+                image_url = _save_zip_image(archive, row["image"])
+        except ValueError as e:
+            errors.append({"row": row_number, "error": str(e)})
+            continue
+        owner = row.get("user_id") if is_admin and row.get("user_id") else user_id
+        docs.append(new_recipe_doc(*fields, image_url, owner))
+        row_numbers.append(row_number)
+        extracted.append(from_zip)
+    return docs, row_numbers, extracted, errors
+
+# Import many recipes at once from NDJSON (one recipe object per line, same
+# fields as add_recipe) or from a zip holding an NDJSON manifest plus the
+# images its rows name in an "image" field. Rows are validated as they
+# stream in and written with unordered insert_many batches. Recipes belong
+# to the caller; admins may set user_id per row.
+@router.post("/bulk_import")
+async def bulk_import_recipes(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="jsonl or csv; defaults to the file extension"),
+    identity: dict = Depends(get_identity)
+):
+    started = time.perf_counter()
+    archive = None
+    if (file.filename or "").lower().endswith(".zip"):
+        archive = await run_blocking(open_zip_upload, file)
+        records = iter_zip_records(archive)
+    else:
+        records = iter_records(file, detect_format(file, format))
+
+    total = inserted = 0
+    errors = []
+    rows = []
+
+    async def flush():
+        nonlocal inserted
+        docs, row_numbers, extracted, batch_errors = await run_blocking(
+            _prepare_import_batch, list(rows), archive, identity["uid"], bool(identity.get("admin"))
+        )
+        rows.clear()
+        errors.extend(batch_errors)
+        if not docs:
+            return
+        failed = set()
+        try:
+            await recipes_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                index = write_error["index"]
+                failed.add(index)
+                errors.append({"row": row_numbers[index], "error": write_error.get("errmsg", "write failed")})
+                # The image extracted for a row that was not stored would be an orphan
+                if extracted[index]:
+                    _remove_uploaded_image(docs[index]["image_url"])
+        for index, doc in enumerate(docs):
+            if index not in failed:
+                adjust_recipe_count(1)
+                pantry_index.put(doc["_id"], doc["ingredient_names"])
+        inserted += len(docs) - len(failed)
+        if len(failed) < len(docs):
+            await bump_collection_version("recipes")
+
+    try:
+        async for row in records:
+            total += 1
+            rows.append(row)
+            if len(rows) >= IMPORT_BATCH_SIZE:
+                await flush()
+        if rows:
+            await flush()
+    finally:
+        if archive is not None:
+            archive.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "total_rows": total,
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed else None
+    }
+
+
+# {"ingredient_names": {"$all": [...]}} for a comma-separated ingredients
+# filter, served by the multikey ingredient_names index
+def ingredient_filter(ingredients: Optional[str]) -> dict:
+    if not ingredients:
+        return {}
+    names = normalize_names(ingredients)
+    if not names:
+        raise HTTPException(status_code=400, detail="No ingredient names in filter")
+    return {"ingredient_names": {"$all": names}}
+
+
+# Get all recipes with pagination and sorting.
+# Pass `cursor` (the previous page's next_cursor) for keyset pagination,
+# which costs the same at any depth; `skip` is kept for existing clients.
 @router.get("/get_recipes")
 async def get_all_recipes(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     sort_by: str = Query("created_at"),
-    sort_order: str = Query("desc")
+    sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    total: Literal["exact", "estimated", "none"] = Query(
+        "exact", description="exact (cached briefly), estimated (collection metadata) or none to skip counting"
+    ),
+    fields: str = Query("card", description="card (list view fields), full, or a comma-separated field list"),
+    ingredients: Optional[str] = Query(None, description="Comma-separated ingredients every recipe must contain"),
 ):
+    # The collection version changes on every recipe write, so an unchanged
+    # ETag means this exact query would return the same page
+    etag = list_etag(request, await collection_version("recipes"))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     sort_direction = 1 if sort_order == "asc" else -1
     allowed_sort_fields = {"title", "category", "user_id", "created_at"}
     if sort_by not in allowed_sort_fields:
         sort_by = "created_at"
 
-    total = recipes_collection.count_documents({})
-    cursor = recipes_collection.find().sort(sort_by, sort_direction).skip(skip).limit(limit)
-    recipes = list(cursor)
+    query = ingredient_filter(ingredients)
+    if query and total != "none":
+        # Filtered totals are not cached; both modes count the index range
+        total_count = await recipes_collection().count_documents(query)
+    elif total == "exact":
+        total_count = await count_recipes()
+    elif total == "estimated":
+        total_count = await recipes_collection().estimated_document_count()
+    else:
+        total_count = None
+
+    if cursor:
+        query.update(keyset_filter(sort_by, sort_direction, *decode_cursor(cursor, sort_by, sort_direction)))
+        skip = 0
+
+    projection = recipe_projection(fields, sort_by)
+    results = recipes_collection().find(query, projection).sort(sort_spec(sort_by, sort_direction)).skip(skip).limit(limit)
+    recipes = await results.to_list(length=limit)
+    next_cursor = encode_cursor(sort_by, sort_direction, recipes[-1]) if len(recipes) == limit else None
     for recipe in recipes:
         recipe["id"] = str(recipe["_id"])
         del recipe["_id"]
 
+    set_etag(response, etag)
     return {
-        "total": total,
+        "total": total_count,
         "skip": skip,
         "limit": limit,
+        "next_cursor": next_cursor,
         "recipes": recipes
     }
 
 
-# Get single recipe by ID, optionally with comments
+def _public_comment(c: dict) -> dict:
+    return {
+        "id": str(c["_id"]),
+        "user_id": c["user_id"],
+        "comment_text": c["comment_text"],
+        "timestamp": c["timestamp"].isoformat()
+    }
+
+def _recipe_etag(recipe: dict, include_comments: bool, comment_limit: int) -> str:
+    return make_etag(recipe["_id"], recipe.get("version", 0), include_comments and comment_limit)
+
+# Get single recipe by ID, optionally with its newest comments. With
+# comments, the recipe and one page of comments come back from a single
+# aggregation; comment_count is kept on the recipe by add_comment.
+# Revalidations (If-None-Match) are answered from the version field alone.
 @router.get("/get_recipe/{recipe_id}")
-async def get_recipe(recipe_id: str, include_comments: bool = Query(False)):
-    recipe = recipes_collection.find_one({"_id": ObjectId(recipe_id)})
+async def get_recipe(
+    recipe_id: str,
+    request: Request,
+    response: Response,
+    include_comments: bool = Query(False),
+    comment_limit: int = Query(20, ge=1, le=100, description="Newest comments to include")
+):
+    if request.headers.get("if-none-match"):
+        current = await recipes_collection().find_one({"_id": ObjectId(recipe_id)}, {"version": 1})
+        if current:
+            etag = _recipe_etag(current, include_comments, comment_limit)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
+    if include_comments:
+        pipeline = [
+            {"$match": {"_id": ObjectId(recipe_id)}},
+            {"$lookup": {
+                "from": "comments",
+                "let": {"recipe_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$recipe_id", "$$recipe_id"]}}},
+                    {"$sort": {"timestamp": -1}},
+                    {"$limit": comment_limit},
+                ],
+                "as": "comments",
+            }},
+        ]
+        results = await recipes_collection().aggregate(pipeline).to_list(length=1)
+        recipe = results[0] if results else None
+    else:
+        recipe = await recipes_collection().find_one({"_id": ObjectId(recipe_id)})
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    set_etag(response, _recipe_etag(recipe, include_comments, comment_limit))
     recipe["id"] = str(recipe["_id"])
     del recipe["_id"]
 
     if include_comments:
-        comments_cursor = comments_collection.find({"recipe_id": ObjectId(recipe_id)}).sort("timestamp", -1)
-        recipe["comments"] = [
-            {
-                "id": str(c["_id"]),
-                "user_id": c["user_id"],
-                "comment_text": c["comment_text"],
-                "timestamp": c["timestamp"].isoformat()
-            } for c in comments_cursor
-        ]
+        recipe["comments"] = [_public_comment(c) for c in recipe["comments"]]
+        if "comment_count" not in recipe:
+            # Recipes from before the counter existed (see migrations.py)
+            recipe["comment_count"] = await comments_collection().count_documents({"recipe_id": ObjectId(recipe_id)})
     return recipe
 
 
-# Get recipes created by logged-in user
+def _public_recipe(recipe: dict) -> dict:
+    recipe["id"] = str(recipe.pop("_id"))
+    return recipe
+
+# Get recipes created by logged-in user, newest first, one cursor page at a
+# time. With stream=true every remaining recipe is written out as NDJSON
+# while it comes off the Mongo cursor instead of being collected first.
 @router.get("/get_my_recipes")
-async def get_my_recipes(user_id: str = Depends(get_current_user_id)):
-    recipes = list(recipes_collection.find({"user_id": user_id}))
-    for recipe in recipes:
-        recipe["id"] = str(recipe["_id"])
-        del recipe["_id"]
-    return recipes
+async def get_my_recipes(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    stream: bool = Query(False, description="Stream all remaining recipes as NDJSON"),
+    fields: str = Query("card", description="card (list view fields), full, or a comma-separated field list"),
+    user_id: str = Depends(get_current_user_id)
+):
+    query = {"user_id": user_id}
+    if cursor:
+        query.update(keyset_filter("created_at", -1, *decode_cursor(cursor, "created_at", -1)))
+    projection = recipe_projection(fields, "created_at")
+    results = recipes_collection().find(query, projection).sort(sort_spec("created_at", -1))
+
+    if stream:
+        results = results.batch_size(STREAM_BATCH_SIZE)
+        return StreamingResponse(ndjson_lines(results, _public_recipe), media_type="application/x-ndjson")
+
+    recipes = await results.limit(limit).to_list(length=limit)
+    next_cursor = encode_cursor("created_at", -1, recipes[-1]) if len(recipes) == limit else None
+    return {
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "recipes": [_public_recipe(recipe) for recipe in recipes]
+    }
+
+
+# Export the whole catalogue (admin only) for analytics and search
+# reindexing. Rows are streamed straight off the Mongo cursor in _id order,
+# optionally gzipped on the fly, so memory use is flat at any size.
+@router.get("/export")
+async def export_recipes(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    gzip: bool = Query(False, description="Gzip the stream"),
+    fields: str = Query("full", description="card, full, or a comma-separated field list"),
+    admin: dict = Depends(require_admin)
+):
+    projection = recipe_projection(fields)
+    results = recipes_collection().find({}, projection).sort("_id", 1).batch_size(STREAM_BATCH_SIZE)
+
+    if format == "csv":
+        columns = ["id", *(sorted(RECIPE_FIELDS) if projection is None else sorted(projection))]
+        body = csv_lines(results, columns, _public_recipe)
+        media_type, filename = "text/csv", "recipes.csv"
+    else:
+        body = ndjson_lines(results, _public_recipe)
+        media_type, filename = "application/x-ndjson", "recipes.ndjson"
+
+    if gzip:
+        body = gzip_chunks(body)
+        media_type, filename = "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# After a write filtered on {_id, user_id} matched nothing: tell a missing
+# recipe (404) apart from someone else's (403).
+async def _raise_write_refused(recipe_id: str, action: str):
+    recipe = await recipes_collection().find_one({"_id": ObjectId(recipe_id)}, {"_id": 1})
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    raise HTTPException(status_code=403, detail=f"Not authorized to {action} this recipe")
 
+def _remove_uploaded_image(image_url: str):
+    path = os.path.join(UPLOAD_DIR, os.path.basename(image_url))
+    if os.path.exists(path):
+        os.remove(path)
 
-# Update a recipe by recipe_id
+# Update a recipe by recipe_id. The ownership check and the write are one
+# conditional update, so concurrent edits cannot slip between them.
 @router.put("/update_recipe/{recipe_id}")
 async def update_recipe(
     recipe_id: str = Path(...),
@@ -140,20 +501,13 @@ async def update_recipe(
     image: UploadFile = File(None),
     user_id: str = Depends(get_current_user_id)
 ):
-    recipe = recipes_collection.find_one({"_id": ObjectId(recipe_id)})
-
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-
-    if recipe["user_id"] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this recipe")
-
     update_data = {}
 
     if title:
         update_data["title"] = title
     if ingredients:
         update_data["ingredients"] = ingredients
+        update_data.update(ingredient_fields(ingredients))
     if steps:
         update_data["steps"] = steps
     if category:
@@ -165,50 +519,119 @@ async def update_recipe(
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Image save failed: {str(e)}")
 
+    owned = {"_id": ObjectId(recipe_id), "user_id": user_id}
     if update_data:
-        recipes_collection.update_one({"_id": ObjectId(recipe_id)}, {"$set": update_data})
+        result = await recipes_collection().update_one(
+            owned, {"$set": {**update_data, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+        )
+        matched = result.matched_count
+    else:
+        matched = await recipes_collection().find_one(owned, {"_id": 1}) is not None
+
+    if not matched:
+        if "image_url" in update_data:
+            _remove_uploaded_image(update_data["image_url"])
+        await _raise_write_refused(recipe_id, "update")
+    if "ingredient_names" in update_data:
+        pantry_index.put(ObjectId(recipe_id), update_data["ingredient_names"])
+    if update_data:
+        await bump_collection_version("recipes")
 
     return {"message": "Recipe updated successfully"}
 
 
-# Delete a recipe by recipe_id
+# Delete a recipe by recipe_id, as one ownership-checked delete
 @router.delete("/delete_recipe/{recipe_id}")
 async def delete_recipe(
     recipe_id: str,
     user_id: str = Depends(get_current_user_id)
 ):
-    recipe = recipes_collection.find_one({"_id": ObjectId(recipe_id)})
-
+    recipe = await recipes_collection().find_one_and_delete(
+        {"_id": ObjectId(recipe_id), "user_id": user_id},
+        projection={"_id": 1}
+    )
     if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-
-    if recipe["user_id"] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this recipe")
-
-    recipes_collection.delete_one({"_id": ObjectId(recipe_id)})
+        await _raise_write_refused(recipe_id, "delete")
+    adjust_recipe_count(-1)
+    pantry_index.remove(recipe["_id"])
+    await bump_collection_version("recipes")
 
     return {"message": "Recipe deleted successfully"}
 
 
-# Search recipes by keyword and/or category
+# Search recipes by keyword, category and/or ingredients, best matches first.
+# Keywords go through the `recipe_text` index over title, ingredients and
+# category (stemmed, whole words), so user input is never a regex.
+# Ingredients must all be present (exact normalized names, see ingredients.py).
 @router.get("/search_recipes")
 async def search_recipes(
-    keyword: str = Query(None, description="Keyword to search in recipe titles"),
+    keyword: str = Query(None, description="Words to search in recipe titles, ingredients and categories"),
     category: str = Query(None, description="Category to filter recipes"),
+    ingredients: Optional[str] = Query(None, description="Comma-separated ingredients every recipe must contain"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    fields: str = Query("card", description="card (list view fields), full, or a comma-separated field list"),
 ):
-    query = {}
+    query = ingredient_filter(ingredients)
     if keyword:
-        query["title"] = {"$regex": keyword, "$options": "i"}  # case-insensitive regex match
+        query["$text"] = {"$search": keyword}
     if category:
         query["category"] = category
 
-    recipes = list(recipes_collection.find(query))
+    projection = recipe_projection(fields)
+    if keyword:
+        projection = {**(projection or {}), "score": {"$meta": "textScore"}}
+        cursor = recipes_collection().find(query, projection).sort([("score", {"$meta": "textScore"})])
+    else:
+        cursor = recipes_collection().find(query, projection).sort("created_at", -1)
+    recipes = await cursor.skip(skip).limit(limit).to_list(length=limit)
     for recipe in recipes:
         recipe["id"] = str(recipe["_id"])
         del recipe["_id"]
     return recipes
 
 
+# -------------------- Pantry matching --------------------
+
+class Pantry(BaseModel):
+    ingredients: List[str]
+    limit: int = Field(20, ge=1, le=100)
+    max_missing: Optional[int] = Field(None, ge=0, description="Skip recipes missing more ingredients than this")
+
+# Rank stored recipes by how much of each one the pantry covers, then by
+# how few ingredients are missing. Scoring runs on the in-memory postings
+# in pantry.py; Mongo is only asked for the winning recipes.
+@router.post("/pantry_match")
+async def pantry_match(
+    pantry: Pantry,
+    fields: str = Query("card", description="card (list view fields), full, or a comma-separated field list"),
+):
+    names = normalize_names(pantry.ingredients)
+    if not names:
+        raise HTTPException(status_code=400, detail="No ingredient names in pantry")
+    projection = recipe_projection(fields, "ingredient_names")
+
+    await pantry_index.ensure_fresh(recipes_collection())
+    ranked = pantry_index.match(names, pantry.limit, pantry.max_missing)
+    found = {
+        recipe["_id"]: recipe
+        async for recipe in recipes_collection().find({"_id": {"$in": [recipe_id for recipe_id, _, _ in ranked]}}, projection)
+    }
+
+    on_hand = set(names)
+    recipes = []
+    for recipe_id, matched, total in ranked:
+        recipe = found.get(recipe_id)
+        if recipe is None:
+            continue  # deleted by another worker since the last rebuild
+        recipe["matched_count"] = matched
+        recipe["missing_count"] = total - matched
+        recipe["coverage"] = round(matched / total, 3)
+        recipe["missing_ingredients"] = [name for name in recipe.get("ingredient_names", []) if name not in on_hand]
+        recipes.append(_public_recipe(recipe))
+    return {"ingredients": names, "recipes": recipes}
+
+
 # -------------------- Comments Feature --------------------
 
 class Comment(BaseModel):
@@ -218,10 +641,16 @@ class Comment(BaseModel):
 # Add a comment to a recipe
 @router.post("/add_comment")
 async def add_comment(comment: Comment, user_id: str = Depends(get_current_user_id)):
-    # Check if recipe exists
-    recipe = recipes_collection.find_one({"_id": ObjectId(comment.recipe_id)})
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
+    # Bump the recipe's denormalised counter; this doubles as the existence
+    # check. Recipes without a counter yet are left for the backfill.
+    result = await recipes_collection().update_one(
+        {"_id": ObjectId(comment.recipe_id), "comment_count": {"$exists": True}},
+        {"$inc": {"comment_count": 1}}
+    )
+    if not result.matched_count:
+        recipe = await recipes_collection().find_one({"_id": ObjectId(comment.recipe_id)}, {"_id": 1})
+        if not recipe:
+            raise HTTPException(status_code=404, detail="Recipe not found")
 
     comment_doc = {
         "recipe_id": ObjectId(comment.recipe_id),
@@ -230,20 +659,21 @@ async def add_comment(comment: Comment, user_id: str = Depends(get_current_user_
         "timestamp": datetime.utcnow()
     }
 
-    comments_collection.insert_one(comment_doc)
+    await comments_collection().insert_one(comment_doc)
+    # Versions move only once the comment is stored, so a response cached
+    # under the old ETag can never hide it
+    await recipes_collection().update_one({"_id": ObjectId(comment.recipe_id)}, {"$inc": {"version": 1}})
+    await bump_collection_version("recipes", "comments")
     return {"message": "Comment added successfully"}
 
 
 # Get all comments for a recipe, newest first
 @router.get("/get_comments/{recipe_id}")
-async def get_comments(recipe_id: str):
-    comments_cursor = comments_collection.find({"recipe_id": ObjectId(recipe_id)}).sort("timestamp", -1)
-    comments = []
-    for c in comments_cursor:
-        comments.append({
-            "id": str(c["_id"]),
-            "user_id": c["user_id"],
-            "comment_text": c["comment_text"],
-            "timestamp": c["timestamp"].isoformat()
-        })
+async def get_comments(recipe_id: str, request: Request, response: Response):
+    etag = list_etag(request, await collection_version("comments"))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    comments_cursor = comments_collection().find({"recipe_id": ObjectId(recipe_id)}).sort("timestamp", -1)
+    comments = [_public_comment(c) async for c in comments_cursor]
+    set_etag(response, etag)
     return comments
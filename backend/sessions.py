@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache import TTLCache
+from db import get_collection
+from executor import run_blocking
+
+SESSION_COOKIE = os.getenv("SESSION_COOKIE", "session")
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 60 * 60)))  # 14 days, in seconds
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+# How long a worker may serve a session from memory before re-reading Mongo;
+# this bounds how late a revocation from another worker is noticed.
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "30"))
+# Unchanged sessions get their expiry and cookie pushed out on activity at
+# most this often, so active users stay logged in (sliding expiry).
+SESSION_RENEW_INTERVAL = int(os.getenv("SESSION_RENEW_INTERVAL", str(24 * 60 * 60)))
+
+
+class SessionStore:
+    """
+    Server-side session data: an in-process LRU in front of the Mongo
+    `sessions` collection, which expires documents through a TTL index.
+
+    Documents are keyed by a SHA-256 of the session ID, so a leaked
+    collection does not yield usable cookies.
+    """
+
+    def __init__(self, collection_name="sessions"):
+        self.collection_name = collection_name
+        self._cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+
+    @property
+    def collection(self):
+        return get_collection(self.collection_name)
+
+    @staticmethod
+    def new_session_id() -> str:
+        return secrets.token_urlsafe(32)
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+
+    def ensure_indexes(self):
+        self.collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        self.collection.create_index([("data.uid", ASCENDING)])
+
+    async def load(self, session_id: str):
+        """
+        Return (data, expires_at) for a live session, else None.
+        """
+        key = self._key(session_id)
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] > datetime.utcnow():
+            return cached
+
+        doc = await run_blocking(self.collection.find_one, {"_id": key})
+        # The TTL monitor only sweeps once a minute, so check expiry here too
+        if not doc or doc["expires_at"] <= datetime.utcnow():
+            return None
+        self._cache.set(key, (doc["data"], doc["expires_at"]))
+        return doc["data"], doc["expires_at"]
+
+    async def save(self, session_id: str, data: dict):
+        key = self._key(session_id)
+        expires_at = datetime.utcnow() + timedelta(seconds=SESSION_MAX_AGE)
+        await run_blocking(
+            self.collection.replace_one,
+            {"_id": key},
+            {"_id": key, "data": data, "expires_at": expires_at},
+            upsert=True,
+        )
+        self._cache.set(key, (data, expires_at))
+
+    async def touch(self, session_id: str, data: dict):
+        """
+        Push an unchanged session's expiry out to SESSION_MAX_AGE from now.
+        """
+        key = self._key(session_id)
+        expires_at = datetime.utcnow() + timedelta(seconds=SESSION_MAX_AGE)
+        await run_blocking(self.collection.update_one, {"_id": key}, {"$set": {"expires_at": expires_at}})
+        self._cache.set(key, (data, expires_at))
+
+    async def delete(self, session_id: str):
+        key = self._key(session_id)
+        self._cache.pop(key)
+        await run_blocking(self.collection.delete_one, {"_id": key})
+
+    async def revoke_user(self, uid: str) -> int:
+        """
+        Drop every session belonging to `uid`, across all workers.
+        """
+        result = await run_blocking(self.collection.delete_many, {"data.uid": uid})
+        self._cache.clear()
+        return result.deleted_count
+
+
+session_store = SessionStore()
+
+
+class ServerSessionMiddleware:
+    """
+    Drop-in replacement for Starlette's SessionMiddleware that keeps
+    `request.session` on the server and ships only an opaque ID in the cookie.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: SessionStore = session_store,
+        session_cookie: str = SESSION_COOKIE,
+        max_age: int = SESSION_MAX_AGE,
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False,
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        session_id = connection.cookies.get(self.session_cookie)
+        initial = expires_at = None
+        if session_id:
+            loaded = await self.store.load(session_id)
+            if loaded is None:
+                session_id = None
+            else:
+                initial, expires_at = loaded
+        # Handlers mutate their own copy; the cached dict stays untouched
+        scope["session"] = json.loads(json.dumps(initial)) if initial else {}
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                if session and session != initial:
+                    if session_id is None:
+                        session_id = self.store.new_session_id()
+                    elif session.get("uid") != (initial or {}).get("uid"):
+                        # Fresh ID whenever the logged-in user changes, so
+                        # a cookie planted before login is worthless after
+                        await self.store.delete(session_id)
+                        session_id = self.store.new_session_id()
+                    await self.store.save(session_id, session)
+                    self._set_cookie(message, session_id, f"Max-Age={self.max_age}; ")
+                elif session and expires_at - datetime.utcnow() < timedelta(seconds=self.max_age - SESSION_RENEW_INTERVAL):
+                    await self.store.touch(session_id, initial)
+                    self._set_cookie(message, session_id, f"Max-Age={self.max_age}; ")
+                elif not session and initial:
+                    await self.store.delete(session_id)
+                    self._set_cookie(message, "null", "expires=Thu, 01 Jan 1970 00:00:00 GMT; ")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _set_cookie(self, message: Message, value: str, expiry: str):
+        headers = MutableHeaders(scope=message)
+        headers.append(
+            "Set-Cookie",
+            f"{self.session_cookie}={value}; path={self.path}; {expiry}{self.security_flags}",
+        )
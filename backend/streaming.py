@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+import zlib
+
+from fastapi.encoders import jsonable_encoder
+
+# Documents pulled from Mongo per round trip while streaming
+STREAM_BATCH_SIZE = 500
+
+
+async def ndjson_lines(cursor, transform=None):
+    """
+    Yield one JSON line per document as it comes off a Motor cursor, so
+    memory use does not depend on the result size.
+    """
+    async for doc in cursor:
+        if transform is not None:
+            doc = transform(doc)
+        yield (json.dumps(jsonable_encoder(doc)) + "\n").encode("utf-8")
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+async def csv_lines(cursor, columns, transform=None):
+    """
+    Yield a CSV header and then one row per document off a Motor cursor.
+    Missing fields become empty cells; lists and objects are written as JSON.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def row(values):
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line.encode("utf-8")
+
+    yield row(columns)
+    async for doc in cursor:
+        if transform is not None:
+            doc = transform(doc)
+        doc = jsonable_encoder(doc)
+        yield row([_cell(doc.get(column)) for column in columns])
+
+
+async def gzip_chunks(chunks, level=6):
+    """
+    Gzip an async byte stream on the fly, emitting output as it fills.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
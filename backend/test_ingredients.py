@@ -0,0 +1,30 @@
+import pytest
+
+from ingredients import parse_ingredient, parse_ingredients
+
+
+@pytest.mark.parametrize("text, quantity, unit, name", [
+    ("1/2 cup milk", 0.5, "cup", "milk"),
+    ("1 1/2 cups rice", 1.5, "cup", "rice"),
+    ("½ tsp salt", 0.5, "tsp", "salt"),
+    ("1½ tbsp ghee", 1.5, "tbsp", "ghee"),
+    ("2-3 green chillies", 2.0, None, "green chilli"),
+    ("2 to 3 cloves garlic", 2.0, "clove", "garlic"),
+    ("200g paneer (cubed)", 200.0, "g", "paneer"),
+    ("paneer 200g", 200.0, "g", "paneer"),
+    ("4 cloves", 4.0, None, "clove"),
+    ("salt to taste", None, None, "salt"),
+])
+def test_parse_ingredient(text, quantity, unit, name):
+    item = parse_ingredient(text)
+    assert item["name"] == name
+    assert item["unit"] == unit
+    if quantity is None:
+        assert item["quantity"] is None
+    else:
+        assert item["quantity"] == pytest.approx(quantity)
+
+
+def test_parse_ingredients_splits_outside_parentheses():
+    items = parse_ingredients("2 cups basmati rice, 200g paneer (cubed, fresh); salt to taste")
+    assert [item["name"] for item in items] == ["basmati rice", "paneer", "salt"]
@@ -0,0 +1,37 @@
+import hashlib
+import os
+
+from firebase_admin import auth
+
+import metrics
+from cache import TTLCache
+from executor import run_blocking
+
+# Verified ID tokens keyed by a SHA-256 of the raw token, so repeat callers
+# skip the RSA signature check. Entries expire at the token's own `exp`.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+verified_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+metrics.register("token_cache", verified_tokens.stats)
+
+
+def _token_key(id_token: str) -> bytes:
+    return hashlib.sha256(id_token.encode("utf-8")).digest()
+
+
+def _verify_and_store(id_token: str, key: bytes) -> dict:
+    claims = auth.verify_id_token(id_token)
+    verified_tokens.set(key, claims, expires_at=claims["exp"])
+    return claims
+
+
+async def verify_id_token_async(id_token: str) -> dict:
+    """
+    Cached firebase_admin.auth.verify_id_token for request handlers: hits are
+    answered inline, misses verify on the blocking I/O pool (a cert fetch may
+    hit the network). Verification errors propagate unchanged.
+    """
+    key = _token_key(id_token)
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        return claims
+    return await run_blocking(_verify_and_store, id_token, key)
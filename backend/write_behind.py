@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# A claimed spill file whose claimer died mid-flush is taken over once it
+# has been untouched for this long.
+SPILL_CLAIM_GRACE = 300
+SPILL_SUFFIX = ".spill.jsonl"
+
+# Every queue created in the process, so the app lifespan can start and
+# drain them together.
+_queues = []
+
+
+def fingerprint(record: dict) -> str:
+    """
+    Stable digest of a JSON-able record, used to skip redundant writes.
+    """
+    payload = json.dumps(record, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+class WriteBehindQueue:
+    """
+    Buffers writes and hands them to `flush_batch` (a blocking callable that
+    receives a list) on the I/O pool, whenever `max_batch` items are pending
+    or `flush_interval` seconds after the first buffered item.
+
+    `on_failure(batch, exc)` is called when a flush raises. With `spill_dir`
+    set, each failed batch is also written to its own fsynced JSON-lines
+    file there; otherwise it is dropped after logging. Spill files are
+    retried when the queue starts and after every successful flush, by
+    whichever worker claims them first (an atomic rename), and deleted only
+    once their items are written or spilled again. A file that cannot be
+    parsed is renamed to .corrupt and skipped.
+    """
+
+    def __init__(self, name, flush_batch, max_batch=500, flush_interval=1.0, on_failure=None, spill_dir=None):
+        self.name = name
+        self.flush_batch = flush_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.on_failure = on_failure
+        self.spill_dir = spill_dir
+        self.flushed = 0
+        self.failed = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+        _queues.append(self)
+
+    def put(self, item):
+        self._queue.put_nowait(item)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"write-behind:{self.name}")
+
+    async def drain(self):
+        """
+        Flush everything queued so far and stop the background task.
+        """
+        if self._task is None or self._task.done():
+            await self._flush_remaining()
+            return
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        await self._replay_spills(reclaim_stale=True)
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                await self._flush_remaining()
+                return
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stopping:
+                await self._flush_remaining()
+                return
+
+    async def _flush_remaining(self):
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def _flush(self, batch, retry_spills=True, spill=True) -> bool:
+        try:
+            await run_blocking(self.flush_batch, batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.exception("Write-behind flush of %d item(s) for %s failed", len(batch), self.name)
+            if spill and self.spill_dir is not None:
+                await run_blocking(self._spill, batch)
+            if self.on_failure is not None:
+                self.on_failure(batch, e)
+            return False
+        if retry_spills:
+            # The backend is reachable again: retry anything spilled earlier
+            await self._replay_spills()
+        return True
+
+    def _spill(self, batch) -> bool:
+        # One file per batch, written under a temporary name and renamed
+        # into place, so readers never see a partial file
+        path = os.path.join(self.spill_dir, f"{self.name}.{time.time_ns()}.{uuid.uuid4().hex}{SPILL_SUFFIX}")
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                for item in batch:
+                    f.write(json.dumps(item, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+        except OSError:
+            logger.exception("Could not spill %d item(s) for %s", len(batch), self.name)
+            return False
+        logger.warning("Spilled %d item(s) for %s to %s", len(batch), self.name, path)
+        return True
+
+    def _claim_spill(self, reclaim_stale=False):
+        """
+        Claim the oldest of this queue's spill files by renaming it to a
+        .claimed name of its own. The rename is atomic, so of several workers
+        racing for a file only one succeeds. Returns the claimed path or None.
+        """
+        if self.spill_dir is None or not os.path.isdir(self.spill_dir):
+            return None
+        now = time.time()
+        for entry in sorted(os.listdir(self.spill_dir)):
+            if not entry.startswith(self.name + "."):
+                continue
+            path = os.path.join(self.spill_dir, entry)
+            try:
+                if entry.endswith(SPILL_SUFFIX):
+                    spill_path = path
+                elif entry.endswith(".claimed") and reclaim_stale and now - os.path.getmtime(path) > SPILL_CLAIM_GRACE:
+                    # Left behind by a worker that died mid-replay
+                    spill_path = path[:path.rindex(SPILL_SUFFIX) + len(SPILL_SUFFIX)]
+                else:
+                    continue
+                # Touch before the rename so the claimed name never looks stale
+                os.utime(path)
+                claimed = f"{spill_path}.{uuid.uuid4().hex}.claimed"
+                os.replace(path, claimed)
+            except OSError:
+                continue
+            return claimed
+        return None
+
+    def _read_spill(self, path):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _quarantine_spill(self, path):
+        # Unreadable files are kept for inspection but leave the replay rotation
+        corrupt = path[:path.rindex(SPILL_SUFFIX) + len(SPILL_SUFFIX)] + ".corrupt"
+        try:
+            os.replace(path, corrupt)
+        except OSError:
+            logger.exception("Could not move unreadable spill file %s aside", path)
+            return
+        logger.error("Moved unreadable spill file %s to %s", path, corrupt)
+
+    async def _replay_spills(self, reclaim_stale=False):
+        # Runs inside the flush loop, which must outlive any replay problem;
+        # a file left claimed is taken over again after SPILL_CLAIM_GRACE
+        try:
+            await self._replay_claimed_spills(reclaim_stale)
+        except Exception:
+            logger.exception("Replaying spilled writes for %s failed", self.name)
+
+    async def _replay_claimed_spills(self, reclaim_stale):
+        while True:
+            path = await run_blocking(self._claim_spill, reclaim_stale)
+            if path is None:
+                return
+            try:
+                items = await run_blocking(self._read_spill, path)
+            except (OSError, ValueError):
+                logger.exception("Could not read spill file %s for %s", path, self.name)
+                await run_blocking(self._quarantine_spill, path)
+                continue
+            logger.info("Replaying %d spilled item(s) for %s from %s", len(items), self.name, path)
+            remaining = []
+            for start in range(0, len(items), self.max_batch):
+                if not await self._flush(items[start:start + self.max_batch], retry_spills=False, spill=False):
+                    remaining = items[start:]
+                    break
+            # The claimed file goes only once its items are written or safely
+            # spilled again; otherwise it stays for a later takeover
+            if remaining and not await run_blocking(self._spill, remaining):
+                return
+            os.remove(path)
+            if remaining:
+                return   # still failing; wait for the next successful flush
+
+
+def start_all():
+    for queue in _queues:
+        queue.start()
+
+
+async def drain_all():
+    for queue in _queues:
+        await queue.drain()